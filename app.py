@@ -1,41 +1,326 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import json
 from datetime import datetime, timedelta, timezone
 import logging
 from collections import defaultdict, Counter
 import re
+from bisect import bisect_right
 import os
+import time
+import uuid
+from functools import lru_cache, wraps
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ahocorasick
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+from firestore_client import get_db
 from query_handler import DatabaseQueryHandler
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+
+try:
+    import psutil
+except ImportError:  # System stats in /api/refresh-status are optional
+    psutil = None
+
+try:
+    import redis
+except ImportError:  # The shared Redis cache is optional
+    redis = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes jsonify() responses with orjson
+    """
+    # Datetimes are passed through to Flask's default so they keep the HTTP date format
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _options(self, indent=False):
+        option = self.option
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Compress JSON payloads such as /api/refresh-all; tiny responses are not worth it
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+# Streamed responses such as server-sent events must not be buffered for compression
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Firestore
-try:
-    # Initialize Firebase Admin SDK
-    # Replace 'path/to/serviceAccountKey.json' with your actual service account key path
-    cred = credentials.Certificate('serviceAccountKey.json')  # You need to add your service account key
-    firebase_admin.initialize_app(cred)
-    
-    db = firestore.client()
-    logger.info("Firestore initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Firestore: {e}")
-    db = None
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Age groups used for query and demographic breakdowns, youngest first
+AGE_GROUPS = ('Under 18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+')
+
+
+# Lower age bound of every group after the first
+AGE_EDGES = (18, 25, 35, 45, 55, 65)
+
+
+def age_group(age):
+    """
+    Map an age to its AGE_GROUPS label
+    """
+    return AGE_GROUPS[bisect_right(AGE_EDGES, age)]
+
+
+# Common medicines and the names they are searched by
+MEDICINE_ALIASES = {
+    'paracetamol': ['paracetamol', 'acetaminophen'],
+    'ibuprofen': ['ibuprofen', 'advil', 'motrin'],
+    'aspirin': ['aspirin', 'acetylsalicylic acid'],
+    'amoxicillin': ['amoxicillin', 'amoxil'],
+    'metformin': ['metformin', 'glucophage'],
+    'omeprazole': ['omeprazole', 'prilosec'],
+    'atorvastatin': ['atorvastatin', 'lipitor'],
+    'lisinopril': ['lisinopril', 'prinivil'],
+    'metoprolol': ['metoprolol', 'lopressor'],
+    'amlodipine': ['amlodipine', 'norvasc']
+}
+
+ALIAS_TO_MEDICINE = {
+    alias: medicine
+    for medicine, aliases in MEDICINE_ALIASES.items()
+    for alias in aliases
+}
+
+# One alternation over every alias so each message is scanned once
+MEDICINE_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(alias) for alias in ALIAS_TO_MEDICINE) + r')\b',
+    re.IGNORECASE
+)
+
+# Enhanced keywords for better categorization
+CATEGORY_KEYWORDS = {
+    'symptoms': [
+        'symptom', 'pain', 'fever', 'headache', 'nausea', 'cough', 'fatigue',
+        'dizzy', 'chest pain', 'stomach pain', 'back pain', 'sore throat',
+        'shortness of breath', 'vomiting', 'diarrhea', 'constipation',
+        'rash', 'swelling', 'numbness', 'tingling', 'weakness', 'ache',
+        'hurt', 'sore', 'burning', 'itchy', 'blurred vision', 'hearing'
+    ],
+    'medications': [
+        'medicine', 'drug', 'prescription', 'dosage', 'tablet', 'capsule',
+        'medication', 'pill', 'paracetamol', 'ibuprofen', 'aspirin',
+        'antibiotic', 'insulin', 'vitamins', 'supplements', 'dose',
+        'side effect', 'pharmacy', 'pharmacist', 'generic', 'brand name'
+    ],
+    'diagnosis': [
+        'diagnosis', 'test', 'scan', 'blood test', 'x-ray', 'mri', 'ct scan',
+        'ultrasound', 'biopsy', 'screening', 'checkup', 'examination',
+        'lab results', 'report', 'finding', 'detected', 'positive', 'negative'
+    ],
+    'treatment': [
+        'treatment', 'therapy', 'surgery', 'procedure', 'operation',
+        'physiotherapy', 'rehabilitation', 'recovery', 'healing',
+        'cure', 'remedy', 'intervention', 'surgical'
+    ],
+    'prevention': [
+        'prevent', 'prevention', 'vaccine', 'immunization', 'health tips',
+        'avoid', 'reduce risk', 'protective', 'screening', 'lifestyle',
+        'precaution', 'safety', 'hygiene'
+    ],
+    'emergency': [
+        'emergency', 'urgent', 'severe', 'critical', 'ambulance', '911',
+        'acute', 'sudden', 'serious', 'life threatening', 'immediate',
+        'hospital', 'er', 'emergency room'
+    ],
+    'general_health': [
+        'health', 'wellness', 'fitness', 'exercise', 'lifestyle',
+        'healthy living', 'wellbeing', 'activity', 'physical activity',
+        'sleep', 'rest', 'energy', 'routine', 'habits'
+    ],
+    'nutrition': [
+        'nutrition', 'diet', 'food', 'vitamin', 'mineral', 'calories',
+        'eating', 'meal', 'snack', 'protein', 'carbohydrate', 'fat',
+        'fiber', 'sugar', 'salt', 'water', 'hydration', 'weight'
+    ],
+    'mental_health': [
+        'stress', 'anxiety', 'depression', 'mental', 'psychology',
+        'therapy', 'counseling', 'mood', 'emotional', 'feelings',
+        'worried', 'sad', 'overwhelmed', 'panic', 'fear', 'cognitive'
+    ]
+}
+
+
+def truncate_text(text, limit=100):
+    """
+    Shorten text to limit characters, marking the cut with an ellipsis
+    """
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+# Redis keys holding cached analytics results, and how they are encoded
+REDIS_KEY_PREFIX = 'analytics:'
+REDIS_JSON_OPTION = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class AnalyticsFallback(dict):
+    """
+    Default payload an analytics method returns when its queries fail
+    """
+
+
+@lru_cache(maxsize=1)
+def get_redis():
+    """
+    Return the Redis client for the shared analytics cache, or None when REDIS_URL is not set
+    """
+    redis_url = os.getenv('REDIS_URL')
+    if not redis_url or not redis:
+        return None
+    # Short timeouts so an unreachable Redis degrades to the local cache instead of stalling requests
+    return redis.Redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1)
+
+
+def cached_analytics(method):
+    """
+    Cache an analytics method's result in the instance TTL cache, keyed by method name and arguments,
+    backed by Redis when configured so every worker shares one computation
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._sync_invalidation()
+        key = hashkey(method.__name__, *args, **kwargs)
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+        
+        shared = get_redis()
+        shared_key = f"{REDIS_KEY_PREFIX}{method.__name__}:{args!r}:{sorted(kwargs.items())!r}"
+        if shared:
+            try:
+                cached = shared.get(shared_key)
+            except redis.RedisError as e:
+                logger.warning(f"Redis cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                result = orjson.loads(cached)
+                with self._cache_lock:
+                    self._cache[key] = result
+                return result
+        
+        result = method(self, *args, **kwargs)
+        
+        # Failures are not cached so the next request retries Firestore
+        if not isinstance(result, AnalyticsFallback) and 'error' not in result:
+            with self._cache_lock:
+                self._cache[key] = result
+            if shared:
+                try:
+                    shared.setex(shared_key, self.REDIS_CACHE_TTL, orjson.dumps(result, option=REDIS_JSON_OPTION))
+                except (redis.RedisError, TypeError) as e:
+                    logger.warning(f"Redis cache write failed: {e}")
+        return result
+    return wrapper
 
 class MedicalAnalytics:
+    # Dashboard payload keys mapped to the analytics method that produces them
+    DASHBOARD_METRICS = {
+        'weeklyUsers': 'get_weekly_active_users',
+        'userQueries': 'get_user_query_statistics',
+        'medicineSearch': 'get_medicine_search_stats',
+        'dailyEngagement': 'get_daily_user_engagement',
+        'demographics': 'get_user_demographics',
+        'chatSessions': 'get_chat_session_analysis',
+        'peakHours': 'get_peak_usage_hours',
+        'retention': 'get_user_retention_analysis',
+        'responseTimes': 'get_response_time_analysis',
+        'contentCategories': 'get_content_category_analysis',
+        'ageCategoryQueries': 'get_age_category_query_analysis',
+        'unfoundDrugs': 'get_unfound_drugs_analytics',
+        'unfoundDrugsTimeline': 'get_unfound_drugs_timeline',
+        'healthCheck': 'get_health_check_analytics'
+    }
+    
+    # Seconds a fused conversation scan is reused before streaming again
+    CONVERSATION_SCAN_TTL = 30
+    
+    # Documents fetched per page when paginating large collections
+    PAGE_SIZE = 500
+    
+    # Seconds analytics results are served from cache
+    CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', '60'))
+    
+    # Seconds analytics results are kept in the shared Redis cache
+    REDIS_CACHE_TTL = int(os.getenv('ANALYTICS_REDIS_TTL', '120'))
+    
+    # Categorized messages kept as examples for the content category response
+    CATEGORY_EXAMPLES = 10
+    
+    # Collection holding precomputed analytics shared by every app instance
+    SUMMARY_COLLECTION = 'analytics_summaries'
+    
+    # Seconds a stored summary is served before it is recomputed
+    SUMMARY_TTL = int(os.getenv('ANALYTICS_SUMMARY_TTL', '300'))
+    
+    # Stored summaries, deleted on cache invalidation so no worker serves them again
+    SUMMARY_NAMES = ('age_category_queries',)
+    
+    # Count age groups with aggregation queries over the denormalized user_age_bucket:
+    # 'true' always, 'false' never, 'auto' once every conversation carries the field
+    USE_DENORMALIZED_BUCKETS = os.getenv('USE_DENORMALIZED_BUCKETS', 'auto').lower()
+    
+    # Document whose generation changes on every cache invalidation, so each worker
+    # drops its local caches too; a worker reads it at most once per interval
+    INVALIDATION_DOCUMENT = ('analytics_cache', 'invalidation')
+    INVALIDATION_CHECK_INTERVAL = float(os.getenv('ANALYTICS_INVALIDATION_CHECK', '1'))
+    
     def __init__(self, db):
         self.db = db
+        self._scan_lock = threading.Lock()
+        self._scan_result = None
+        self._scan_time = 0.0
+        self._category_automaton = self._build_category_automaton()
+        self._cache = TTLCache(maxsize=256, ttl=self.CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        self._invalidation_lock = threading.Lock()
+        self._invalidation_checked_at = 0.0
+        self._cache_generation = None
+        # Lookup tables shared across methods, guarded per table
+        self._tables = {}
+        self._table_locks = {'users': threading.Lock(), 'chat_owners': threading.Lock()}
+        # Reused across dashboard refreshes instead of spawning threads per request
+        self._executor = ThreadPoolExecutor(max_workers=len(self.DASHBOARD_METRICS), thread_name_prefix='analytics')
+        # Separate pool for the aggregation queries a single metric fans out,
+        # so they never wait behind the metrics that are waiting on them
+        self._query_executor = ThreadPoolExecutor(max_workers=len(AGE_GROUPS) + 2, thread_name_prefix='firestore-query')
     
     def _ensure_timezone_aware(self, dt):
         
         if dt is None:
             return None
+        if dt.tzinfo is timezone.utc:
+            # Firestore timestamps are already UTC, so skip the conversion
+            return dt
         if dt.tzinfo is None:
             # Assume UTC if no timezone info
             return dt.replace(tzinfo=timezone.utc)
@@ -43,11 +328,238 @@ class MedicalAnalytics:
             # Convert to UTC
             return dt.astimezone(timezone.utc)
     
+    def _paginate(self, query, page_size=None):
+        """
+        Yield every document matching the query, fetched in cursor-based pages
+        """
+        page_size = page_size or self.PAGE_SIZE
+        page_query = query.order_by('__name__').limit(page_size)
+        last_doc = None
+        
+        while True:
+            page = page_query.start_after(last_doc) if last_doc else page_query
+            docs = list(page.stream())
+            yield from docs
+            
+            if len(docs) < page_size:
+                break
+            last_doc = docs[-1]
+    
+    def _build_category_automaton(self):
+        """
+        Build an Aho-Corasick automaton over every category keyword
+        """
+        keyword_categories = defaultdict(list)
+        for index, keywords in enumerate(CATEGORY_KEYWORDS.values()):
+            for keyword in keywords:
+                keyword_categories[keyword].append(index)
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, category_indexes in keyword_categories.items():
+            # Only the highest-priority category a keyword belongs to can win
+            automaton.add_word(keyword, (keyword, category_indexes[0]))
+        automaton.make_automaton()
+        return automaton
+    
+    def _scan_conversations(self):
+        """
+        Return the fused conversation aggregates, rescanning once they are stale
+        """
+        # Concurrent callers wait for the scan in progress instead of starting their own
+        with self._scan_lock:
+            if self._scan_result is None or time.monotonic() - self._scan_time > self.CONVERSATION_SCAN_TTL:
+                self._scan_result = self._build_conversation_scan()
+                self._scan_time = time.monotonic()
+            return self._scan_result
+    
+    def _shared_table(self, name, build):
+        """
+        Return a lookup table shared by the analytics methods, rebuilding it once it is stale
+        """
+        with self._table_locks[name]:
+            built_at, table = self._tables.get(name, (0.0, None))
+            if table is None or time.monotonic() - built_at > self.CONVERSATION_SCAN_TTL:
+                table = build()
+                self._tables[name] = (time.monotonic(), table)
+            return table
+    
+    def _users_directory(self):
+        """
+        Map each user_id to its display name and age, loaded once for every analytics method
+        """
+        def build():
+            users_by_id = {}
+            users_ref = self.db.collection('users').select(['user_id', 'display_name', 'age'])
+            for user in self._paginate(users_ref):
+                user_data = user.to_dict() or {}
+                if user_data.get('user_id'):
+                    # Keep the first document per user_id, as a limit(1) lookup would
+                    users_by_id.setdefault(user_data['user_id'], user_data)
+            return users_by_id
+        
+        return self._shared_table('users', build)
+    
+    def _chat_owners(self):
+        """
+        Map each chat document path to the user_id that owns it, loaded once for every analytics method
+        """
+        def build():
+            chats_ref = self.db.collection_group('chats').select(['user_id'])
+            return {
+                chat.reference.path: (chat.to_dict() or {}).get('user_id')
+                for chat in self._paginate(chats_ref)
+            }
+        
+        return self._shared_table('chat_owners', build)
+    
+    def _build_conversation_scan(self):
+        """
+        Stream the conversations collection group once and build the aggregates for
+        medicine searches, daily engagement, peak hours, response times and categories
+        """
+        thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+        first_day = (thirty_days_ago - EPOCH).days
+        
+        # Load users once so each conversation resolves its owner's name in memory.
+        # Chat owners are only needed for conversations that predate the denormalized user_id
+        users_by_id = self._users_directory()
+        chat_owners = None
+        
+        medicine_searches = defaultdict(list)
+        medicine_users = defaultdict(set)
+        all_medicines = set()
+        days = []
+        hours = []
+        response_lengths = []
+        categories = {category: 0 for category in CATEGORY_KEYWORDS}
+        categories['other'] = 0
+        category_names = list(CATEGORY_KEYWORDS)
+        categorized_details = []
+        total_conversations = 0
+        total_queries = 0
+        
+        logger.info("Starting conversation scan...")
+        
+        # Only the fields read below; image_url and bot_response_tamil stay on the server
+        conversations_ref = self.db.collection_group('conversations').select(['user_id', 'user_message', 'bot_response', 'timestamp'])
+        for conv in self._paginate(conversations_ref):
+            conv_data = conv.to_dict() or {}
+            total_conversations += 1
+            
+            bot_response = conv_data.get('bot_response') or ''
+            user_message = (conv_data.get('user_message') or '').lower()
+            bot_message = bot_response.lower()
+            
+            # Peak hours and daily engagement
+            timestamp = conv_data.get('timestamp')
+            if timestamp:
+                timestamp = self._ensure_timezone_aware(timestamp)
+                hours.append(timestamp.hour)
+                
+                if timestamp >= thirty_days_ago:
+                    # Bucket by day index relative to the window; labels are formatted later
+                    days.append((timestamp - EPOCH).days - first_day)
+            
+            response_lengths.append(len(bot_response))
+            
+            # Medicine mentions, attributed to the conversation's user or the chat owner
+            user_id = conv_data.get('user_id')
+            if not user_id:
+                chat_ref = conv.reference.parent.parent
+                if chat_ref and chat_owners is None:
+                    chat_owners = self._chat_owners()
+                user_id = chat_owners.get(chat_ref.path) if chat_ref else None
+            if user_id:
+                user_name = users_by_id.get(user_id, {}).get('display_name', user_id)
+                
+                for message in (user_message, bot_message):
+                    # Truncated once per message and shared by every medicine it mentions
+                    search_context = None
+                    for match in MEDICINE_RE.finditer(message):
+                        medicine = ALIAS_TO_MEDICINE[match.group(1).lower()]
+                        all_medicines.add(medicine)
+                        if user_id not in medicine_users[medicine]:
+                            medicine_users[medicine].add(user_id)
+                            if search_context is None:
+                                search_context = truncate_text(message)
+                            medicine_searches[medicine].append({
+                                'user_id': user_id,
+                                'user_name': user_name,
+                                'search_context': search_context
+                            })
+            
+            # Content categories
+            if not user_message.strip():
+                continue
+            
+            total_queries += 1
+            
+            # Find keywords in one pass; the first category in CATEGORY_KEYWORDS
+            # order with a match wins. Matched keywords are only collected while
+            # examples are still needed, otherwise stop at a top-priority hit
+            keep_example = len(categorized_details) < self.CATEGORY_EXAMPLES
+            best_index = len(category_names)
+            matched = set()
+            for _, (keyword, category_index) in self._category_automaton.iter(user_message):
+                if category_index < best_index:
+                    best_index = category_index
+                if keep_example:
+                    matched.add(keyword)
+                elif best_index == 0:
+                    break
+            
+            if best_index < len(category_names):
+                category = category_names[best_index]
+                categories[category] += 1
+                if keep_example:
+                    categorized_details.append({
+                        'message': user_message[:100],
+                        'category': category,
+                        'keywords': [kw for kw in CATEGORY_KEYWORDS[category] if kw in matched]
+                    })
+            else:
+                categories['other'] += 1
+                if keep_example:
+                    categorized_details.append({
+                        'message': user_message[:100],
+                        'category': 'other',
+                        'keywords': []
+                    })
+        
+        logger.info(f"Conversation scan completed: {total_conversations} conversations")
+        
+        # Log a few samples for debugging, outside the per-conversation loop
+        logger.info(f"First conversation hours: {hours[:5]}")
+        for index, detail in enumerate(categorized_details[:5], 1):
+            logger.info(f"Message {index}: '{detail['message'][:50]}...'")
+        
+        # Simulate response time analysis based on message length
+        # In real implementation, you'd track actual response times
+        response_times = np.array(response_lengths, dtype=np.float64) * 0.01 + 0.5  # seconds
+        
+        # Histogram the collected hours and days in one call each
+        hourly_usage = np.bincount(np.array(hours, dtype=np.int64), minlength=24)
+        daily_engagement = np.bincount(np.array(days, dtype=np.int64), minlength=31)
+        
+        return {
+            'medicine_searches': medicine_searches,
+            'all_medicines': all_medicines,
+            'daily_engagement': daily_engagement,
+            'first_day': first_day,
+            'hourly_usage': hourly_usage,
+            'response_times': response_times,
+            'categories': categories,
+            'categorized_details': categorized_details,
+            'total_conversations': total_conversations,
+            'total_queries': total_queries
+        }
+    
+    @cached_analytics
     def get_weekly_active_users(self):
         
         try:
             one_week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-            users_ref = self.db.collection('users')
+            users_ref = self.db.collection('users').select(['user_id', 'display_name', 'last_login'])
             
             # Get users who logged in within the last week
             query = users_ref.where('last_login', '>=', one_week_ago)
@@ -72,13 +584,22 @@ class MedicalAnalytics:
             }
         except Exception as e:
             logger.error(f"Error getting weekly active users: {e}")
-            return {'count': 0, 'users': []}
+            return AnalyticsFallback({'count': 0, 'users': []})
     
+    @cached_analytics
     def get_user_query_statistics(self):
         
         try:
-            users_ref = self.db.collection('users')
-            all_users = users_ref.stream()
+            # Aggregate message counts per user in a single pass over all chats
+            # instead of issuing one collection group query per user
+            chats = self._paginate(self.db.collection_group('chats').select(['user_id', 'message_count']))
+            message_counts = defaultdict(int)
+            for chat in chats:
+                chat_data = chat.to_dict()
+                message_counts[chat_data.get('user_id')] += chat_data.get('message_count', 0)
+            
+            users_ref = self.db.collection('users').select(['user_id', 'display_name', 'last_login'])
+            all_users = self._paginate(users_ref)
             
             user_stats = []
             total_queries = 0
@@ -87,15 +608,7 @@ class MedicalAnalytics:
                 user_data = user.to_dict()
                 user_id = user_data.get('user_id')
                 
-                # Get all chats for this user
-                chats_ref = self.db.collection_group('chats').where('user_id', '==', user_id)
-                chats = chats_ref.stream()
-                
-                user_query_count = 0
-                for chat in chats:
-                    chat_data = chat.to_dict()
-                    user_query_count += chat_data.get('message_count', 0)
-                
+                user_query_count = message_counts.get(user_id, 0)
                 total_queries += user_query_count
                 
                 last_login = user_data.get('last_login')
@@ -120,99 +633,19 @@ class MedicalAnalytics:
             }
         except Exception as e:
             logger.error(f"Error getting user query statistics: {e}")
-            return {'total_queries': 0, 'total_users': 0, 'average_queries_per_user': 0, 'user_statistics': []}
+            return AnalyticsFallback({'total_queries': 0, 'total_users': 0, 'average_queries_per_user': 0, 'user_statistics': []})
     
+    @cached_analytics
     def get_medicine_search_stats(self, medicine_name=None):
         
         try:
-            # Get all conversations
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.stream()
-            
-            medicine_searches = defaultdict(list)
-            all_medicines = set()
-            
-            # Common medicine patterns to search for
-            medicine_patterns = [
-                r'\b(?:paracetamol|acetaminophen)\b',
-                r'\b(?:ibuprofen|advil|motrin)\b',
-                r'\b(?:aspirin|acetylsalicylic acid)\b',
-                r'\b(?:amoxicillin|amoxil)\b',
-                r'\b(?:metformin|glucophage)\b',
-                r'\b(?:omeprazole|prilosec)\b',
-                r'\b(?:atorvastatin|lipitor)\b',
-                r'\b(?:lisinopril|prinivil)\b',
-                r'\b(?:metoprolol|lopressor)\b',
-                r'\b(?:amlodipine|norvasc)\b'
-            ]
-            
-            for conv in conversations:
-                try:
-                    conv_data = conv.to_dict()
-                    if not conv_data:
-                        continue
-                        
-                    user_message = conv_data.get('user_message', '').lower()
-                    bot_message = conv_data.get('bot_response','').lower()
-
-                    # Get user info with proper null checking
-                    chat_ref = conv.reference.parent.parent
-                    if not chat_ref:
-                        continue
-                        
-                    chat_doc = chat_ref.get()
-                    if not chat_doc.exists:
-                        continue
-                        
-                    chat_data = chat_doc.to_dict()
-                    if not chat_data:
-                        continue
-                        
-                    user_id = chat_data.get('user_id')
-                    if not user_id:
-                        continue
-                    
-                    # Get user details with proper null checking
-                    user_ref = self.db.collection('users').where('user_id', '==', user_id).limit(1)
-                    user_docs = list(user_ref.stream())
-                    user_name = user_id
-                    
-                    if user_docs:
-                        user_doc = user_docs[0]
-                        if user_doc.exists:
-                            user_data = user_doc.to_dict()
-                            if user_data:
-                                user_name = user_data.get('display_name', user_id)
-                except Exception as e:
-                    logger.warning(f"Error processing conversation: {e}")
-                    continue
-                
-                # Check for medicine mentions
-                for pattern in medicine_patterns:
-                    user_matches = re.findall(pattern, user_message, re.IGNORECASE)
-                    bot_matches = re.findall(pattern, bot_message, re.IGNORECASE)
-                    for match in user_matches:
-                        medicine = match.lower()
-                        all_medicines.add(medicine)
-                        if user_id not in [u['user_id'] for u in medicine_searches[medicine]]:
-                            medicine_searches[medicine].append({
-                                'user_id': user_id,
-                                'user_name': user_name,
-                                'search_context': user_message[:100] + '...' if len(user_message) > 100 else user_message
-                            })
-                    for match in bot_matches:
-                        medicine = match.lower()
-                        all_medicines.add(medicine)
-                        if user_id not in [u['user_id'] for u in medicine_searches[medicine]]:
-                            medicine_searches[medicine].append({
-                                'user_id': user_id,
-                                'user_name': user_name,
-                                'search_context': bot_message[:100] + '...' if len(bot_message) > 100 else bot_message
-                            })
+            scan = self._scan_conversations()
+            medicine_searches = scan['medicine_searches']
             
             # If specific medicine requested, return only that
             if medicine_name:
                 medicine_name = medicine_name.lower()
+                medicine_name = ALIAS_TO_MEDICINE.get(medicine_name, medicine_name)
                 return {
                     'medicine': medicine_name,
                     'search_count': len(medicine_searches.get(medicine_name, [])),
@@ -231,57 +664,51 @@ class MedicalAnalytics:
             medicine_stats.sort(key=lambda x: x['search_count'], reverse=True)
             
             return {
-                'total_medicines_searched': len(all_medicines),
+                'total_medicines_searched': len(scan['all_medicines']),
                 'medicine_statistics': medicine_stats
             }
             
         except Exception as e:
             logger.error(f"Error getting medicine search statistics: {e}")
-            return {'total_medicines_searched': 0, 'medicine_statistics': []}
+            return AnalyticsFallback({'total_medicines_searched': 0, 'medicine_statistics': []})
     
+    @cached_analytics
     def get_daily_user_engagement(self):
         
         try:
-            thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.where('timestamp', '>=', thirty_days_ago).stream()
-            
-            daily_engagement = defaultdict(int)
-            
-            for conv in conversations:
-                conv_data = conv.to_dict()
-                timestamp = conv_data.get('timestamp')
-                if timestamp:
-                    timestamp = self._ensure_timezone_aware(timestamp)
-                    date_key = timestamp.strftime('%Y-%m-%d')
-                    daily_engagement[date_key] += 1
+            scan = self._scan_conversations()
+            daily_engagement = scan['daily_engagement']
+            first_day = scan['first_day']
             
-            # Fill in missing days with 0
+            # Fill in missing days with 0, formatting only the 30 chart labels
+            today = (datetime.now(timezone.utc) - EPOCH).days
             engagement_data = []
-            for i in range(30):
-                date = (datetime.now(timezone.utc) - timedelta(days=i)).strftime('%Y-%m-%d')
+            for day in range(today - 29, today + 1):
+                index = day - first_day
                 engagement_data.append({
-                    'date': date,
-                    'queries': daily_engagement.get(date, 0)
+                    'date': (EPOCH + timedelta(days=day)).strftime('%Y-%m-%d'),
+                    'queries': int(daily_engagement[index]) if 0 <= index < len(daily_engagement) else 0
                 })
             
-            engagement_data.reverse()  # Chronological order
+            total_queries = int(daily_engagement.sum())
         
             return {
                 'daily_engagement': engagement_data,
-                'total_queries_30_days': sum(daily_engagement.values()),
-                'average_daily_queries': round(sum(daily_engagement.values()) / 30, 2)
+                'total_queries_30_days': total_queries,
+                'average_daily_queries': round(total_queries / 30, 2)
             }
             
         except Exception as e:
             logger.error(f"Error getting daily engagement: {e}")
-            return {'daily_engagement': [], 'total_queries_30_days': 0, 'average_daily_queries': 0}
+            return AnalyticsFallback({'daily_engagement': [], 'total_queries_30_days': 0, 'average_daily_queries': 0})
     
+    @cached_analytics
     def get_user_demographics(self):
         
         try:
-            users_ref = self.db.collection('users')
-            users = users_ref.stream()
+            # Project to the fields tallied below; age and provider still need every user
+            users_ref = self.db.collection('users').select(['age', 'email_verified', 'oauth_provider', 'profile_complete'])
+            users = self._paginate(users_ref)
             
             age_groups = defaultdict(int)
             verification_stats = {'verified': 0, 'unverified': 0}
@@ -297,20 +724,7 @@ class MedicalAnalytics:
                 # Age demographics
                 age = user_data.get('age')
                 if age:
-                    if age < 18:
-                        age_groups['Under 18'] += 1
-                    elif age < 25:
-                        age_groups['18-24'] += 1
-                    elif age < 35:
-                        age_groups['25-34'] += 1
-                    elif age < 45:
-                        age_groups['35-44'] += 1
-                    elif age < 55:
-                        age_groups['45-54'] += 1
-                    elif age < 65:
-                        age_groups['55-64'] += 1
-                    else:
-                        age_groups['65+'] += 1
+                    age_groups[age_group(age)] += 1
                 
                 # Email verification
                 if user_data.get('email_verified'):
@@ -339,35 +753,92 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting user demographics: {e}")
-            return {'total_users': 0, 'age_distribution': {}, 'verification_stats': {}, 'oauth_providers': {}, 'profile_completion': {}}
+            return AnalyticsFallback({'total_users': 0, 'age_distribution': {}, 'verification_stats': {}, 'oauth_providers': {}, 'profile_completion': {}})
+    
+    def _count(self, query):
+        """
+        Run a count() aggregation for a query and return the number of matches
+        """
+        return int(query.count().get()[0][0].value)
+    
+    def _chat_session_aggregates(self):
+        """
+        Compute chat session statistics with server-side aggregation queries
+        """
+        chats_ref = self.db.collection_group('chats')
+        
+        # The four queries are independent, so issue them together
+        totals = self._query_executor.submit(
+            chats_ref.count(alias='sessions').sum('message_count', alias='messages').get
+        )
+        # Consider sessions with >1 message as active
+        active = self._query_executor.submit(self._count, chats_ref.where('message_count', '>', 1))
+        # Longest and shortest sessions are single-document ordered reads
+        longest = self._query_executor.submit(
+            chats_ref.order_by('message_count', direction='DESCENDING').limit(1).select(['message_count']).get
+        )
+        shortest = self._query_executor.submit(
+            chats_ref.order_by('message_count').limit(1).select(['message_count']).get
+        )
+        
+        totals = {result.alias: result.value for result in totals.result()[0]}
+        total_sessions = int(totals['sessions'])
+        active_sessions = active.result()
+        longest = longest.result()
+        shortest = shortest.result()
+        
+        if not total_sessions:
+            return total_sessions, active_sessions, 0, 0, 0
+        
+        return (
+            total_sessions,
+            active_sessions,
+            (totals['messages'] or 0) / total_sessions,
+            longest[0].get('message_count') if longest else 0,
+            shortest[0].get('message_count') if shortest else 0
+        )
+    
+    def _chat_session_scan(self):
+        """
+        Compute chat session statistics by paging through every chat's message count
+        """
+        # Only message_count is needed, so skip transferring the rest of each chat
+        chats_ref = self.db.collection_group('chats').select(['message_count'])
+        chats = self._paginate(chats_ref)
+        
+        session_lengths = np.fromiter(
+            (chat.to_dict().get('message_count', 0) for chat in chats),
+            dtype=np.int64
+        )
+        total_sessions = int(session_lengths.size)
+        
+        # Consider sessions with >1 message as active
+        active_sessions = int((session_lengths > 1).sum())
+        
+        if not total_sessions:
+            return total_sessions, active_sessions, 0, 0, 0
+        
+        return (
+            total_sessions,
+            active_sessions,
+            float(session_lengths.mean()),
+            int(session_lengths.max()),
+            int(session_lengths.min())
+        )
     
+    @cached_analytics
     def get_chat_session_analysis(self):
         
         try:
-            chats_ref = self.db.collection_group('chats')
-            chats = chats_ref.stream()
+            try:
+                stats = self._chat_session_aggregates()
+            except Exception as e:
+                # The aggregation path needs the chats.message_count collection
+                # group index from firestore.indexes.json
+                logger.warning(f"Chat session aggregation failed, scanning chats instead: {e}")
+                stats = self._chat_session_scan()
             
-            session_lengths = []
-            total_sessions = 0
-            active_sessions = 0
-            
-            for chat in chats:
-                chat_data = chat.to_dict()
-                total_sessions += 1
-                
-                message_count = chat_data.get('message_count', 0)
-                session_lengths.append(message_count)
-                
-                # Consider sessions with >1 message as active
-                if message_count > 1:
-                    active_sessions += 1
-            
-            if session_lengths:
-                avg_session_length = sum(session_lengths) / len(session_lengths)
-                max_session_length = max(session_lengths)
-                min_session_length = min(session_lengths)
-            else:
-                avg_session_length = max_session_length = min_session_length = 0
+            total_sessions, active_sessions, avg_session_length, max_session_length, min_session_length = stats
             
             return {
                 'total_sessions': total_sessions,
@@ -380,47 +851,32 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting chat session analysis: {e}")
-            return {'total_sessions': 0, 'active_sessions': 0, 'average_session_length': 0, 'max_session_length': 0, 'min_session_length': 0, 'session_engagement_rate': 0}
+            return AnalyticsFallback({'total_sessions': 0, 'active_sessions': 0, 'average_session_length': 0, 'max_session_length': 0, 'min_session_length': 0, 'session_engagement_rate': 0})
     
+    @cached_analytics
     def get_peak_usage_hours(self):
         
         try:
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.stream()
-            
-            hourly_usage = defaultdict(int)
-            total_conversations = 0
-            
-            logger.info("Starting peak usage hours analysis...")
-            
-            for conv in conversations:
-                conv_data = conv.to_dict()
-                total_conversations += 1
-                
-                timestamp = conv_data.get('timestamp')
-                if timestamp:
-                    timestamp = self._ensure_timezone_aware(timestamp)
-                    hour = timestamp.hour
-                    hourly_usage[hour] += 1
-                    
-                    # Log first few for debugging
-                    if total_conversations <= 5:
-                        logger.info(f"Conversation {total_conversations}: {timestamp} (Hour: {hour})")
+            scan = self._scan_conversations()
+            hourly_usage = scan['hourly_usage']
+            total_conversations = scan['total_conversations']
             
             logger.info(f"Processed {total_conversations} conversations for peak hours analysis")
-            logger.info(f"Hourly distribution: {dict(hourly_usage)}")
+            active_hours = {hour: int(count) for hour, count in enumerate(hourly_usage) if count}
+            logger.info(f"Hourly distribution: {active_hours}")
             
             # Convert to list format for charts (ensure all 24 hours are represented)
             hourly_data = []
             for hour in range(24):
                 hourly_data.append({
                     'hour': f"{hour:02d}:00",
-                    'usage_count': hourly_usage.get(hour, 0)
+                    'usage_count': int(hourly_usage[hour])
                 })
             
             # Find peak hour
-            if hourly_usage:
-                peak_hour_num, peak_count = max(hourly_usage.items(), key=lambda x: x[1])
+            if hourly_usage.any():
+                peak_hour_num = int(hourly_usage.argmax())
+                peak_count = int(hourly_usage[peak_hour_num])
                 peak_hour = f"{peak_hour_num:02d}:00"
             else:
                 peak_hour_num, peak_count = 0, 0
@@ -438,18 +894,19 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting peak usage hours: {e}")
-            return {
+            return AnalyticsFallback({
                 'hourly_usage': [],
                 'peak_hour': '00:00',
                 'peak_hour_count': 0,
                 'total_conversations_analyzed': 0,
                 'error': str(e)
-            }
+            })
     
+    @cached_analytics
     def get_user_retention_analysis(self):
         
         try:
-            users_ref = self.db.collection('users')
+            users_ref = self.db.collection('users').select(['created_at', 'last_login', 'login_count'])
             users = users_ref.stream()
             
             # Use timezone-aware datetime for consistency
@@ -499,34 +956,20 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting user retention analysis: {e}")
-            return {'new_users_last_7_days': 0, 'new_users_last_30_days': 0, 'returning_users_last_7_days': 0, 'returning_users_last_30_days': 0, 'inactive_users': 0}
+            return AnalyticsFallback({'new_users_last_7_days': 0, 'new_users_last_30_days': 0, 'returning_users_last_7_days': 0, 'returning_users_last_30_days': 0, 'inactive_users': 0})
     
+    @cached_analytics
     def get_response_time_analysis(self):
         
         try:
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.stream()
-            
-            response_times = []
-            total_conversations = 0
-            
-            for conv in conversations:
-                conv_data = conv.to_dict()
-                total_conversations += 1
-                
-                # Simulate response time analysis based on message length
-                # In real implementation, you'd track actual response times
-                user_message = conv_data.get('user_message', '')
-                bot_response = conv_data.get('bot_response', '')
-                
-                # Estimate response time based on response length (mock calculation)
-                estimated_response_time = len(bot_response) * 0.01 + 0.5  # seconds
-                response_times.append(estimated_response_time)
-            
-            if response_times:
-                avg_response_time = sum(response_times) / len(response_times)
-                max_response_time = max(response_times)
-                min_response_time = min(response_times)
+            scan = self._scan_conversations()
+            response_times = scan['response_times']
+            total_conversations = scan['total_conversations']
+            
+            if response_times.size:
+                avg_response_time = float(response_times.mean())
+                max_response_time = float(response_times.max())
+                min_response_time = float(response_times.min())
             else:
                 avg_response_time = max_response_time = min_response_time = 0
             
@@ -535,127 +978,22 @@ class MedicalAnalytics:
                 'average_response_time': round(avg_response_time, 2),
                 'max_response_time': round(max_response_time, 2),
                 'min_response_time': round(min_response_time, 2),
-                'fast_responses': len([t for t in response_times if t < 1.0]),
-                'slow_responses': len([t for t in response_times if t > 3.0])
+                'fast_responses': int((response_times < 1.0).sum()),
+                'slow_responses': int((response_times > 3.0).sum())
             }
             
         except Exception as e:
             logger.error(f"Error getting response time analysis: {e}")
-            return {'total_responses': 0, 'average_response_time': 0, 'max_response_time': 0, 'min_response_time': 0, 'fast_responses': 0, 'slow_responses': 0}
+            return AnalyticsFallback({'total_responses': 0, 'average_response_time': 0, 'max_response_time': 0, 'min_response_time': 0, 'fast_responses': 0, 'slow_responses': 0})
     
+    @cached_analytics
     def get_content_category_analysis(self):
        
         try:
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.stream()
-            
-            categories = {
-                'symptoms': 0,
-                'medications': 0,
-                'diagnosis': 0,
-                'treatment': 0,
-                'prevention': 0,
-                'emergency': 0,
-                'general_health': 0,
-                'nutrition': 0,
-                'mental_health': 0,
-                'other': 0
-            }
-            
-            # Enhanced keywords for better categorization
-            category_keywords = {
-                'symptoms': [
-                    'symptom', 'pain', 'fever', 'headache', 'nausea', 'cough', 'fatigue',
-                    'dizzy', 'chest pain', 'stomach pain', 'back pain', 'sore throat',
-                    'shortness of breath', 'vomiting', 'diarrhea', 'constipation',
-                    'rash', 'swelling', 'numbness', 'tingling', 'weakness', 'ache',
-                    'hurt', 'sore', 'burning', 'itchy', 'blurred vision', 'hearing'
-                ],
-                'medications': [
-                    'medicine', 'drug', 'prescription', 'dosage', 'tablet', 'capsule',
-                    'medication', 'pill', 'paracetamol', 'ibuprofen', 'aspirin',
-                    'antibiotic', 'insulin', 'vitamins', 'supplements', 'dose',
-                    'side effect', 'pharmacy', 'pharmacist', 'generic', 'brand name'
-                ],
-                'diagnosis': [
-                    'diagnosis', 'test', 'scan', 'blood test', 'x-ray', 'mri', 'ct scan',
-                    'ultrasound', 'biopsy', 'screening', 'checkup', 'examination',
-                    'lab results', 'report', 'finding', 'detected', 'positive', 'negative'
-                ],
-                'treatment': [
-                    'treatment', 'therapy', 'surgery', 'procedure', 'operation',
-                    'physiotherapy', 'rehabilitation', 'recovery', 'healing',
-                    'cure', 'remedy', 'intervention', 'surgical'
-                ],
-                'prevention': [
-                    'prevent', 'prevention', 'vaccine', 'immunization', 'health tips',
-                    'avoid', 'reduce risk', 'protective', 'screening', 'lifestyle',
-                    'precaution', 'safety', 'hygiene'
-                ],
-                'emergency': [
-                    'emergency', 'urgent', 'severe', 'critical', 'ambulance', '911',
-                    'acute', 'sudden', 'serious', 'life threatening', 'immediate',
-                    'hospital', 'er', 'emergency room'
-                ],
-                'general_health': [
-                    'health', 'wellness', 'fitness', 'exercise', 'lifestyle',
-                    'healthy living', 'wellbeing', 'activity', 'physical activity',
-                    'sleep', 'rest', 'energy', 'routine', 'habits'
-                ],
-                'nutrition': [
-                    'nutrition', 'diet', 'food', 'vitamin', 'mineral', 'calories',
-                    'eating', 'meal', 'snack', 'protein', 'carbohydrate', 'fat',
-                    'fiber', 'sugar', 'salt', 'water', 'hydration', 'weight'
-                ],
-                'mental_health': [
-                    'stress', 'anxiety', 'depression', 'mental', 'psychology',
-                    'therapy', 'counseling', 'mood', 'emotional', 'feelings',
-                    'worried', 'sad', 'overwhelmed', 'panic', 'fear', 'cognitive'
-                ]
-            }
-            
-            total_queries = 0
-            categorized_details = []
-            
-            logger.info("Starting content category analysis...")
-            
-            for conv in conversations:
-                conv_data = conv.to_dict()
-                user_message = conv_data.get('user_message', '').lower()
-                
-                if not user_message.strip():
-                    continue
-                    
-                total_queries += 1
-                
-                # Log first few messages for debugging
-                if total_queries <= 5:
-                    logger.info(f"Message {total_queries}: '{user_message[:50]}...'")
-                
-                categorized = False
-                matched_keywords = []
-                
-                # Check each category for keyword matches
-                for category, keywords in category_keywords.items():
-                    found_keywords = [kw for kw in keywords if kw in user_message]
-                    if found_keywords:
-                        categories[category] += 1
-                        categorized = True
-                        matched_keywords = found_keywords
-                        categorized_details.append({
-                            'message': user_message[:100],
-                            'category': category,
-                            'keywords': found_keywords
-                        })
-                        break
-                
-                if not categorized:
-                    categories['other'] += 1
-                    categorized_details.append({
-                        'message': user_message[:100],
-                        'category': 'other',
-                        'keywords': []
-                    })
+            scan = self._scan_conversations()
+            categories = scan['categories']
+            total_queries = scan['total_queries']
+            categorized_details = scan['categorized_details']
             
             logger.info(f"Processed {total_queries} conversations for content analysis")
             logger.info(f"Category distribution: {dict(categories)}")
@@ -685,7 +1023,7 @@ class MedicalAnalytics:
             result = {
                 'total_queries': total_queries,
                 'category_breakdown': category_stats,
-                'categorized_examples': categorized_details[:10]  # Include some examples
+                'categorized_examples': categorized_details  # Include some examples
             }
             
             logger.info(f"Content analysis result: {len(category_stats)} categories, top category: {category_stats[0]['category'] if category_stats else 'None'}")
@@ -693,7 +1031,7 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting content category analysis: {e}")
-            return {
+            return AnalyticsFallback({
                 'total_queries': 0, 
                 'category_breakdown': [{
                     'category': 'Error',
@@ -702,97 +1040,159 @@ class MedicalAnalytics:
                 }],
                 'categorized_examples': [],
                 'error': str(e)
-            }
+            })
     
+    def _age_bucket_aggregates(self, require_coverage=False):
+        """
+        Count queries per age group with aggregation queries over the denormalized user_age_bucket field.
+        With require_coverage, return None unless every conversation has been bucketed
+        """
+        conversations_ref = self.db.collection_group('conversations')
+        group_queries = [conversations_ref.where('user_age_bucket', '==', group) for group in AGE_GROUPS]
+        
+        if require_coverage:
+            # Ordering by the bucket drops conversations without the field but keeps the backfill's
+            # explicit null, so two counts show whether every conversation has been bucketed
+            # before the per-group counts are paid for
+            total_queries, bucketed = self._query_executor.map(
+                self._count, [conversations_ref, conversations_ref.order_by('user_age_bucket')]
+            )
+            if bucketed < total_queries:
+                return None
+            group_counts = list(self._query_executor.map(self._count, group_queries))
+        else:
+            # Issue the total and per-group counts together so their round trips overlap
+            total_queries, *group_counts = self._query_executor.map(self._count, [conversations_ref] + group_queries)
+        
+        age_query_data = Counter(dict(zip(AGE_GROUPS, group_counts)))
+        
+        # Distinct users seen in conversations has no aggregation; counting them would
+        # take the full chats stream this path exists to avoid, so it is left unknown
+        return total_queries, age_query_data, None
+    
+    def _age_bucket_scan(self):
+        """
+        Count queries per age group by resolving each conversation's owner and age
+        """
+        # Load users once so each conversation is resolved with in-memory lookups.
+        # Chat owners are only loaded if a conversation lacks its own user_id
+        users_by_id = self._users_directory()
+        chat_owners = None
+        
+        # Get all conversations; only their owner is needed, so project away every other field
+        conversations_ref = self.db.collection_group('conversations').select(['user_id'])
+        conversations = self._paginate(conversations_ref)
+        
+        age_query_data = Counter(dict.fromkeys(AGE_GROUPS, 0))
+        users_seen = set()
+        total_queries = 0
+        
+        logger.info("Starting age category query analysis...")
+        
+        for conv in conversations:
+            total_queries += 1
+            
+            # Conversations written with user_id skip the chat owner lookup
+            user_id = (conv.to_dict() or {}).get('user_id')
+            if not user_id:
+                chat_ref = conv.reference.parent.parent
+                if not chat_ref:
+                    continue
+                if chat_owners is None:
+                    chat_owners = self._chat_owners()
+                user_id = chat_owners.get(chat_ref.path)
+            if not user_id:
+                continue
+            
+            users_seen.add(user_id)
+            age = users_by_id.get(user_id, {}).get('age')
+            
+            if age is not None:
+                age_query_data[age_group(age)] += 1
+        
+        # Log a few users for debugging, outside the per-conversation loop
+        for user_id in islice(users_seen, 5):
+            logger.info(f"User {user_id}, Age: {users_by_id.get(user_id, {}).get('age')}")
+        
+        return total_queries, age_query_data, len(users_seen)
+    
+    def _read_summary(self, name):
+        """
+        Return a stored analytics summary if it is still fresh, otherwise None
+        """
+        try:
+            doc = self.db.collection(self.SUMMARY_COLLECTION).document(name).get()
+        except Exception as e:
+            logger.warning(f"Could not read {name} summary: {e}")
+            return None
+        
+        summary = doc.to_dict() if doc.exists else None
+        if not summary or not summary.get('updated_at'):
+            return None
+        
+        updated_at = self._ensure_timezone_aware(summary.pop('updated_at'))
+        if (datetime.now(timezone.utc) - updated_at).total_seconds() > self.SUMMARY_TTL:
+            return None
+        return summary
+    
+    def _write_summary(self, name, summary):
+        """
+        Store an analytics summary so other instances can serve it without recomputing
+        """
+        try:
+            self.db.collection(self.SUMMARY_COLLECTION).document(name).set({
+                **summary,
+                'updated_at': datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            logger.warning(f"Could not store {name} summary: {e}")
+    
+    @cached_analytics
     def get_age_category_query_analysis(self):
         """
         Analyze the number of queries by age category
         """
         try:
-            # Get all conversations
-            conversations_ref = self.db.collection_group('conversations')
-            conversations = conversations_ref.stream()
-            
-            age_query_data = defaultdict(int)
-            user_age_cache = {}
-            total_queries = 0
-            queries_with_age_data = 0
+            # A fresh stored summary is a single document read
+            summary = self._read_summary('age_category_queries')
+            if summary:
+                return summary
+            
+            bucket_counts = None
+            mode = self.USE_DENORMALIZED_BUCKETS
+            if mode in ('auto', '1', 'true', 'yes'):
+                try:
+                    bucket_counts = self._age_bucket_aggregates(require_coverage=mode == 'auto')
+                    if bucket_counts is None:
+                        logger.info("Not every conversation has user_age_bucket yet, scanning conversations")
+                except Exception as e:
+                    logger.warning(f"Age bucket aggregation failed, scanning conversations instead: {e}")
             
-            logger.info("Starting age category query analysis...")
+            if bucket_counts is None:
+                bucket_counts = self._age_bucket_scan()
             
-            for conv in conversations:
-                conv_data = conv.to_dict()
-                total_queries += 1
-                
-                # Get user info from the chat reference
-                chat_ref = conv.reference.parent.parent
-                if not chat_ref:
-                    continue
-                    
-                chat_data = chat_ref.get().to_dict()
-                if not chat_data:
-                    continue
-                    
-                user_id = chat_data.get('user_id')
-                if not user_id:
-                    continue
-                
-                # Get user age (with caching)
-                if user_id not in user_age_cache:
-                    users_ref = self.db.collection('users').where('user_id', '==', user_id).limit(1)
-                    user_docs = list(users_ref.stream())
-                    
-                    if user_docs:
-                        user_data = user_docs[0].to_dict()
-                        age = user_data.get('age')
-                        user_age_cache[user_id] = age
-                    else:
-                        user_age_cache[user_id] = None
-                
-                age = user_age_cache[user_id]
-                
-                if age is not None:
-                    queries_with_age_data += 1
-                    
-                    # Categorize by age group
-                    if age < 18:
-                        age_query_data['Under 18'] += 1
-                    elif age < 25:
-                        age_query_data['18-24'] += 1
-                    elif age < 35:
-                        age_query_data['25-34'] += 1
-                    elif age < 45:
-                        age_query_data['35-44'] += 1
-                    elif age < 55:
-                        age_query_data['45-54'] += 1
-                    elif age < 65:
-                        age_query_data['55-64'] += 1
-                    else:
-                        age_query_data['65+'] += 1
-                
-                # Log progress for first few queries
-                if total_queries <= 5:
-                    logger.info(f"Query {total_queries}: User {user_id}, Age: {age}")
+            total_queries, age_query_data, unique_users = bucket_counts
+            queries_with_age_data = sum(age_query_data.values())
             
             logger.info(f"Processed {total_queries} total queries, {queries_with_age_data} with age data")
             logger.info(f"Age category distribution: {dict(age_query_data)}")
             
-            # Create sorted breakdown
-            age_order = ['Under 18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+']
+            # Create sorted breakdown, tracking the most active age group on the way
             age_breakdown = []
+            most_active_group = ('Unknown', 0)
             
-            for age_group in age_order:
-                query_count = age_query_data.get(age_group, 0)
+            for group in AGE_GROUPS:
+                query_count = age_query_data[group]
                 percentage = (query_count / queries_with_age_data * 100) if queries_with_age_data > 0 else 0
                 
                 age_breakdown.append({
-                    'age_group': age_group,
+                    'age_group': group,
                     'query_count': query_count,
                     'percentage': round(percentage, 1)
                 })
-            
-            # Find most active age group
-            most_active_group = max(age_query_data.items(), key=lambda x: x[1]) if age_query_data else ('Unknown', 0)
+                
+                if query_count > most_active_group[1]:
+                    most_active_group = (group, query_count)
             
             result = {
                 'total_queries': total_queries,
@@ -803,15 +1203,16 @@ class MedicalAnalytics:
                     'age_group': most_active_group[0],
                     'query_count': most_active_group[1]
                 },
-                'unique_users_analyzed': len(user_age_cache)
+                'unique_users_analyzed': unique_users
             }
             
             logger.info(f"Age analysis result: Most active group is {most_active_group[0]} with {most_active_group[1]} queries")
+            self._write_summary('age_category_queries', result)
             return result
             
         except Exception as e:
             logger.error(f"Error getting age category query analysis: {e}")
-            return {
+            return AnalyticsFallback({
                 'total_queries': 0,
                 'queries_with_age_data': 0,
                 'queries_without_age_data': 0,
@@ -819,8 +1220,9 @@ class MedicalAnalytics:
                 'most_active_age_group': {'age_group': 'Unknown', 'query_count': 0},
                 'unique_users_analyzed': 0,
                 'error': str(e)
-            }
+            })
     
+    @cached_analytics
     def get_unfound_drugs_analytics(self):
         """
         Comprehensive analysis of unfound drugs data
@@ -917,7 +1319,7 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting unfound drugs analytics: {e}")
-            return {
+            return AnalyticsFallback({
                 'total_unfound_drugs': 0,
                 'total_search_frequency': 0,
                 'unique_tablet_names': 0,
@@ -930,8 +1332,9 @@ class MedicalAnalytics:
                 'recent_searches': [],
                 'top_chat_sources': {},
                 'error': str(e)
-            }
+            })
     
+    @cached_analytics
     def get_unfound_drugs_timeline(self):
         """
         Get timeline analysis of unfound drug searches
@@ -981,14 +1384,15 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting unfound drugs timeline: {e}")
-            return {
+            return AnalyticsFallback({
                 'daily_timeline': [],
                 'monthly_timeline': [],
                 'total_search_days': 0,
                 'peak_search_day': ('None', 0),
                 'error': str(e)
-            }
+            })
     
+    @cached_analytics
     def get_health_check_analytics(self):
         """
         Analyze health check data
@@ -1031,35 +1435,165 @@ class MedicalAnalytics:
             
         except Exception as e:
             logger.error(f"Error getting health check analytics: {e}")
-            return {
+            return AnalyticsFallback({
                 'total_health_checks': 0,
                 'status_distribution': {},
                 'timeline': [],
                 'most_common_status': 'None',
                 'error': str(e)
-            }
+            })
+    
+    def _invalidation_ref(self):
+        collection, document = self.INVALIDATION_DOCUMENT
+        return self.db.collection(collection).document(document)
+    
+    def _sync_invalidation(self):
+        """
+        Drop this worker's local caches if another worker invalidated them since the last check
+        """
+        # Held across the read so concurrent metrics wait for the answer instead of serving stale results
+        with self._invalidation_lock:
+            if time.monotonic() - self._invalidation_checked_at < self.INVALIDATION_CHECK_INTERVAL:
+                return
+            # Stamped before the read so a failing Firestore is retried once per interval,
+            # not once per metric call
+            self._invalidation_checked_at = time.monotonic()
+            try:
+                doc = self._invalidation_ref().get()
+            except Exception as e:
+                logger.warning(f"Could not read cache invalidation marker: {e}")
+                return
+            generation = (doc.to_dict() or {}).get('generation') if doc.exists else None
+            if generation == self._cache_generation:
+                return
+            self._cache_generation = generation
+        self._clear_local_caches()
+    
+    def clear_cache(self):
+        """
+        Drop cached analytics results in every worker: locally, in Redis, the stored
+        summaries and, through the invalidation marker, the other workers' local caches
+        """
+        generation = uuid.uuid4().hex
+        with self._invalidation_lock:
+            self._cache_generation = generation
+        self._clear_local_caches()
+        for name in self.SUMMARY_NAMES:
+            try:
+                self.db.collection(self.SUMMARY_COLLECTION).document(name).delete()
+            except Exception as e:
+                logger.warning(f"Could not delete {name} summary: {e}")
+        shared = get_redis()
+        if shared:
+            try:
+                keys = list(shared.scan_iter(f"{REDIS_KEY_PREFIX}*"))
+                if keys:
+                    shared.delete(*keys)
+            except redis.RedisError as e:
+                logger.warning(f"Redis cache clear failed: {e}")
+        # Written last, so workers that see it cannot reload a shared result from before the clear
+        try:
+            self._invalidation_ref().set({'generation': generation, 'invalidated_at': datetime.now(timezone.utc)})
+        except Exception as e:
+            logger.warning(f"Could not store cache invalidation marker, other workers keep their caches: {e}")
+    
+    def _clear_local_caches(self):
+        """
+        Drop this worker's cached analytics results, fused conversation scan and shared lookup tables
+        """
+        with self._cache_lock:
+            self._cache.clear()
+        with self._scan_lock:
+            self._scan_result = None
+        for name, lock in self._table_locks.items():
+            with lock:
+                self._tables.pop(name, None)
+    
+    def get_metrics(self, names):
+        """
+        Run the named dashboard analytics methods concurrently and collect the results
+        """
+        # Each method blocks on its own Firestore streams, so run them on the
+        # shared worker threads and let their network waits overlap
+        futures = {
+            name: self._executor.submit(getattr(self, self.DASHBOARD_METRICS[name]))
+            for name in names
+        }
+        return {name: future.result() for name, future in futures.items()}
+    
+    def iter_metrics(self, names):
+        """
+        Run the named dashboard analytics methods concurrently, yielding (name, result) as each finishes
+        """
+        futures = {
+            self._executor.submit(getattr(self, self.DASHBOARD_METRICS[name])): name
+            for name in names
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    
+    def get_dashboard(self):
+        """
+        Run every dashboard analytics method concurrently and collect the results
+        """
+        return self.get_metrics(self.DASHBOARD_METRICS)
 
-# Initialize analytics and query handler
-analytics = MedicalAnalytics(db) if db else None
+@lru_cache(maxsize=1)
+def get_analytics():
+    """
+    Return the process-wide MedicalAnalytics, or None if Firestore is unavailable
+    """
+    db = get_db()
+    return MedicalAnalytics(db) if db else None
 
-# Initialize query handler with better error handling
-try:
-    if db:
-        from query_handler import DatabaseQueryHandler
-        import os
-        gemini_api_key = os.getenv('GEMINI_API_KEY')
-        if gemini_api_key and gemini_api_key.strip() and gemini_api_key != 'your_gemini_api_key_here':
-            query_handler = DatabaseQueryHandler(db, gemini_api_key)
-            logger.info("Query handler initialized successfully with Gemini API")
-        else:
-            query_handler = None
-            logger.warning("Gemini API key not properly configured - natural language queries will not work")
-    else:
-        query_handler = None
+
+def hourly_conversation_counts():
+    """
+    Conversations per hour of day from the cached peak hours analytics, or None if they failed
+    """
+    analytics = get_analytics()
+    if not analytics:
+        return None
+    peak_hours = analytics.get_peak_usage_hours()
+    if 'error' in peak_hours:
+        return None
+    return [row['usage_count'] for row in peak_hours['hourly_usage']]
+
+
+@lru_cache(maxsize=1)
+def get_query_handler():
+    """
+    Return the process-wide DatabaseQueryHandler, or None if it cannot be configured
+    """
+    db = get_db()
+    if not db:
         logger.error("Database not initialized - query handler disabled")
-except Exception as e:
-    logger.error(f"Failed to initialize query handler: {e}")
-    query_handler = None
+        return None
+    
+    gemini_api_key = (os.getenv('GEMINI_API_KEY') or '').strip()
+    if not gemini_api_key or gemini_api_key == 'your_gemini_api_key_here':
+        logger.warning("Gemini API key not properly configured - natural language queries will not work")
+        return None
+    
+    try:
+        query_handler = DatabaseQueryHandler(db, gemini_api_key, hourly_usage=hourly_conversation_counts)
+        logger.info("Query handler initialized successfully with Gemini API")
+        return query_handler
+    except Exception as e:
+        logger.error(f"Failed to initialize query handler: {e}")
+        return None
+
+
+def requires_analytics(view):
+    """
+    Answer 500 from an analytics route when Firestore failed to initialize
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not get_analytics():
+            return jsonify({'error': 'Database not initialized'}), 500
+        return view(*args, **kwargs)
+    return wrapper
 
 @app.route('/')
 def dashboard():
@@ -1067,50 +1601,40 @@ def dashboard():
     return render_template('dashboard.html')
 
 @app.route('/api/weekly-users')
+@requires_analytics
 def api_weekly_users():
     """API endpoint for weekly active users"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_weekly_active_users()
+    data = get_analytics().get_weekly_active_users()
     return jsonify(data)
 
 @app.route('/api/user-queries')
+@requires_analytics
 def api_user_queries():
     """API endpoint for user query statistics"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_user_query_statistics()
+    data = get_analytics().get_user_query_statistics()
     return jsonify(data)
 
 @app.route('/api/medicine-search')
 @app.route('/api/medicine-search/<medicine_name>')
+@requires_analytics
 def api_medicine_search(medicine_name=None):
     """API endpoint for medicine search statistics"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_medicine_search_stats(medicine_name)
+    data = get_analytics().get_medicine_search_stats(medicine_name)
     return jsonify(data)
 
 @app.route('/api/daily-engagement')
+@requires_analytics
 def api_daily_engagement():
     """API endpoint for daily user engagement"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_daily_user_engagement()
+    data = get_analytics().get_daily_user_engagement()
     return jsonify(data)
 
 @app.route('/api/demographics')
+@requires_analytics
 def api_demographics():
     """API endpoint for user demographics"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
     try:
-        data = analytics.get_user_demographics()
+        data = get_analytics().get_user_demographics()
         
         # Log the data for debugging
         logger.info(f"Demographics API response: {data}")
@@ -1138,57 +1662,45 @@ def api_demographics():
         }), 500
 
 @app.route('/api/chat-sessions')
+@requires_analytics
 def api_chat_sessions():
     """API endpoint for chat session analysis"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_chat_session_analysis()
+    data = get_analytics().get_chat_session_analysis()
     return jsonify(data)
 
 @app.route('/api/peak-hours')
+@requires_analytics
 def api_peak_hours():
     """API endpoint for peak usage hours"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_peak_usage_hours()
+    data = get_analytics().get_peak_usage_hours()
     return jsonify(data)
 
 @app.route('/api/retention')
+@requires_analytics
 def api_retention():
     """API endpoint for user retention analysis"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_user_retention_analysis()
+    data = get_analytics().get_user_retention_analysis()
     return jsonify(data)
 
 @app.route('/api/response-times')
+@requires_analytics
 def api_response_times():
     """API endpoint for response time analysis"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_response_time_analysis()
+    data = get_analytics().get_response_time_analysis()
     return jsonify(data)
 
 @app.route('/api/content-categories')
+@requires_analytics
 def api_content_categories():
     """API endpoint for content category analysis"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_content_category_analysis()
+    data = get_analytics().get_content_category_analysis()
     return jsonify(data)
 
 @app.route('/api/age-category-queries')
+@requires_analytics
 def api_age_category_queries():
     """API endpoint for age category query analysis"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_age_category_query_analysis()
+    data = get_analytics().get_age_category_query_analysis()
     return jsonify(data)
 
 @app.route('/api/natural-query', methods=['POST'])
@@ -1196,6 +1708,7 @@ def api_natural_query():
     """API endpoint for natural language database queries"""
     logger.info("Natural query API endpoint called")
     
+    query_handler = get_query_handler()
     if not query_handler:
         error_msg = "Query handler not initialized. Please check Gemini API key configuration."
         logger.error(error_msg)
@@ -1244,9 +1757,58 @@ def api_natural_query():
             'traceback': str(e)
         }), 500
 
+@app.route('/api/natural-queries', methods=['POST'])
+def api_natural_queries():
+    """API endpoint for several natural language queries answered together"""
+    query_handler = get_query_handler()
+    if not query_handler:
+        return jsonify({
+            'success': False,
+            'error': "Query handler not initialized. Please check Gemini API key configuration.",
+            'details': 'Check .env file for GEMINI_API_KEY'
+        }), 500
+    
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({
+            'success': False,
+            'error': "A non-empty 'queries' list is required"
+        }), 400
+    
+    natural_queries = [query.strip() for query in queries if isinstance(query, str) and query.strip()]
+    if len(natural_queries) != len(queries):
+        return jsonify({
+            'success': False,
+            'error': "Queries must be non-empty strings"
+        }), 400
+    
+    if len(natural_queries) > DatabaseQueryHandler.MAX_BATCH_QUERIES:
+        return jsonify({
+            'success': False,
+            'error': f"At most {DatabaseQueryHandler.MAX_BATCH_QUERIES} queries can be sent at once"
+        }), 400
+    
+    try:
+        results = query_handler.process_natural_queries(natural_queries)
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+        
+    except Exception as e:
+        error_msg = f"Error processing natural queries: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': error_msg
+        }), 500
+
 @app.route('/api/sample-queries')
 def api_sample_queries():
     """API endpoint to get sample queries"""
+    query_handler = get_query_handler()
     if not query_handler:
         return jsonify({'error': 'Query handler not initialized'}), 500
     
@@ -1256,6 +1818,7 @@ def api_sample_queries():
 @app.route('/api/db-structure')
 def api_db_structure():
     """API endpoint to get database structure information"""
+    query_handler = get_query_handler()
     if not query_handler:
         return jsonify({'error': 'Query handler not initialized'}), 500
     
@@ -1281,93 +1844,139 @@ def api_db_structure():
         }
     })
 
+# Seconds system stats are reused between polls of /api/refresh-status
+SYSTEM_STATS_TTL = 5
+
+BOOT_TIME = psutil.boot_time() if psutil else None
+if psutil:
+    # The first cpu_percent() call always reports 0.0, so take it at startup
+    psutil.cpu_percent()
+_system_stats_lock = threading.Lock()
+_system_stats = {'sampled_at': 0.0, 'stats': None}
+
+
+def sample_system_stats():
+    """
+    Return CPU, memory and disk usage, sampling psutil at most once per SYSTEM_STATS_TTL
+    """
+    with _system_stats_lock:
+        now = time.time()
+        if now - _system_stats['sampled_at'] > SYSTEM_STATS_TTL:
+            _system_stats['stats'] = {
+                'cpu_percent': psutil.cpu_percent(),
+                'memory_percent': psutil.virtual_memory().percent,
+                'disk_percent': psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:\\').percent
+            }
+            _system_stats['sampled_at'] = now
+        return _system_stats['stats']
+
 @app.route('/api/refresh-status')
 def api_refresh_status():
     """API endpoint to get current refresh status and stats"""
     try:
-        # Get system stats
-        import psutil
-        import time
+        if not psutil:
+            # psutil not available, return basic stats
+            return jsonify({
+                'server_time': datetime.now().isoformat(),
+                'database_status': 'connected' if get_db() else 'disconnected',
+                'analytics_status': 'enabled' if get_analytics() else 'disabled',
+                'query_handler_status': 'enabled' if get_query_handler() else 'disabled'
+            })
         
         refresh_stats = {
             'server_time': datetime.now().isoformat(),
-            'uptime': time.time() - psutil.boot_time(),
+            'uptime': time.time() - BOOT_TIME,
             'last_refresh': request.headers.get('X-Last-Refresh', 'Unknown'),
-            'database_status': 'connected' if db else 'disconnected',
-            'analytics_status': 'enabled' if analytics else 'disabled',
-            'query_handler_status': 'enabled' if query_handler else 'disabled',
-            'system': {
-                'cpu_percent': psutil.cpu_percent(),
-                'memory_percent': psutil.virtual_memory().percent,
-                'disk_percent': psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:\\').percent
-            }
+            'database_status': 'connected' if get_db() else 'disconnected',
+            'analytics_status': 'enabled' if get_analytics() else 'disabled',
+            'query_handler_status': 'enabled' if get_query_handler() else 'disabled',
+            'system': sample_system_stats()
         }
         
         return jsonify(refresh_stats)
         
-    except ImportError:
-        # psutil not available, return basic stats
-        return jsonify({
-            'server_time': datetime.now().isoformat(),
-            'database_status': 'connected' if db else 'disconnected',
-            'analytics_status': 'enabled' if analytics else 'disabled',
-            'query_handler_status': 'enabled' if query_handler else 'disabled'
-        })
     except Exception as e:
         logger.error(f"Error getting refresh status: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/unfound-drugs')
+@requires_analytics
 def api_unfound_drugs():
     """API endpoint for unfound drugs analytics"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_unfound_drugs_analytics()
+    data = get_analytics().get_unfound_drugs_analytics()
     return jsonify(data)
 
 @app.route('/api/unfound-drugs-timeline')
+@requires_analytics
 def api_unfound_drugs_timeline():
     """API endpoint for unfound drugs timeline"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_unfound_drugs_timeline()
+    data = get_analytics().get_unfound_drugs_timeline()
     return jsonify(data)
 
 @app.route('/api/health-check')
+@requires_analytics
 def api_health_check():
     """API endpoint for health check analytics"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
-    data = analytics.get_health_check_analytics()
+    data = get_analytics().get_health_check_analytics()
     return jsonify(data)
 
+@app.route('/api/cache-invalidate', methods=['POST'])
+@requires_analytics
+def api_cache_invalidate():
+    """API endpoint to drop cached analytics so the next request reads Firestore"""
+    get_analytics().clear_cache()
+    
+    # Only this worker's natural-query reads are dropped; other workers keep theirs
+    # for at most the proxy's 30 second TTL
+    query_handler = get_query_handler()
+    if query_handler:
+        query_handler.clear_cache()
+    return jsonify({'success': True})
+
+@app.route('/api/batch', methods=['POST'])
+@requires_analytics
+def api_batch():
+    """API endpoint returning several dashboard metrics in one response"""
+    payload = request.get_json(silent=True) or {}
+    # Bodies that are not a JSON object fail the check below
+    metrics = (payload.get('metrics') or list(MedicalAnalytics.DASHBOARD_METRICS)) if isinstance(payload, dict) else None
+    
+    if not isinstance(metrics, list) or not all(isinstance(name, str) for name in metrics):
+        return jsonify({
+            'success': False,
+            'error': "'metrics' must be a list of metric names"
+        }), 400
+    
+    unknown = [name for name in metrics if name not in MedicalAnalytics.DASHBOARD_METRICS]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'error': f"Unknown metrics: {', '.join(map(str, unknown))}"
+        }), 400
+    
+    try:
+        data = get_analytics().get_metrics(metrics)
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error loading batched metrics: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/refresh-all')
+@requires_analytics
 def api_refresh_all():
     """API endpoint to refresh all dashboard data"""
-    if not analytics:
-        return jsonify({'error': 'Database not initialized'}), 500
-    
     try:
-        # Collect all data
-        all_data = {
-            'weeklyUsers': analytics.get_weekly_active_users(),
-            'userQueries': analytics.get_user_query_statistics(),
-            'medicineSearch': analytics.get_medicine_search_stats(),
-            'dailyEngagement': analytics.get_daily_user_engagement(),
-            'demographics': analytics.get_user_demographics(),
-            'chatSessions': analytics.get_chat_session_analysis(),
-            'peakHours': analytics.get_peak_usage_hours(),
-            'retention': analytics.get_user_retention_analysis(),
-            'responseTimes': analytics.get_response_time_analysis(),
-            'contentCategories': analytics.get_content_category_analysis(),
-            'ageCategoryQueries': analytics.get_age_category_query_analysis(),
-            'unfoundDrugs': analytics.get_unfound_drugs_analytics(),
-            'unfoundDrugsTimeline': analytics.get_unfound_drugs_timeline(),
-            'healthCheck': analytics.get_health_check_analytics()
-        }
+        # Collect all data concurrently
+        all_data = get_analytics().get_dashboard()
         
         return jsonify({
             'success': True,
@@ -1382,5 +1991,28 @@ def api_refresh_all():
             'error': str(e)
         }), 500
 
+@app.route('/api/refresh-all-stream')
+@requires_analytics
+def api_refresh_all_stream():
+    """API endpoint streaming each dashboard metric as a server-sent event once it is ready"""
+    analytics = get_analytics()
+    
+    def generate():
+        try:
+            for name, data in analytics.iter_metrics(MedicalAnalytics.DASHBOARD_METRICS):
+                yield f"data: {app.json.dumps({'metric': name, 'data': data})}\n\n"
+            yield f"event: done\ndata: {app.json.dumps({'timestamp': datetime.now().isoformat()})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming dashboard data: {e}")
+            yield f"event: error\ndata: {app.json.dumps({'error': str(e)})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Local development only; deployments run gunicorn -c gunicorn_conf.py app:app
+    debug = os.getenv('FLASK_DEBUG', 'true').lower() in ('1', 'true', 'yes')
+    app.run(debug=debug, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
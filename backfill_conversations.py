@@ -0,0 +1,85 @@
+"""
+Backfill denormalized fields onto conversation documents.
+
+Writes onto every conversation:
+- user_id, copied from the parent chat, so analytics can skip the chat lookup
+- user_age_bucket, so the dashboard can count age groups with aggregation
+  queries (USE_DENORMALIZED_BUCKETS)
+
+Usage: python backfill_conversations.py [--dry-run]
+"""
+import argparse
+import logging
+
+from firestore_client import get_db
+from app import age_group
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 500
+
+
+def backfill(db, dry_run=False):
+    """
+    Write user_id and user_age_bucket onto each conversation from its chat owner
+    """
+    user_ages = {}
+    for user in db.collection('users').select(['user_id', 'age']).stream():
+        user_data = user.to_dict() or {}
+        if user_data.get('user_id'):
+            user_ages.setdefault(user_data['user_id'], user_data.get('age'))
+
+    chat_owners = {
+        chat.reference.path: (chat.to_dict() or {}).get('user_id')
+        for chat in db.collection_group('chats').select(['user_id']).stream()
+    }
+
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    for conv in db.collection_group('conversations').select(['user_id', 'user_age_bucket']).stream():
+        chat_ref = conv.reference.parent.parent
+        user_id = chat_owners.get(chat_ref.path) if chat_ref else None
+        age = user_ages.get(user_id)
+        bucket = age_group(age) if age is not None else None
+
+        # Conversations without a known age get an explicit null bucket
+        conv_data = conv.to_dict() or {}
+        changes = {}
+        if user_id and conv_data.get('user_id') != user_id:
+            changes['user_id'] = user_id
+        if 'user_age_bucket' not in conv_data or conv_data['user_age_bucket'] != bucket:
+            changes['user_age_bucket'] = bucket
+        if not changes:
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+
+        batch.update(conv.reference, changes)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    logger.info(f"{'Would update' if dry_run else 'Updated'} {updated} conversations")
+    return updated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='count the documents that would change without writing')
+    args = parser.parse_args()
+
+    db = get_db()
+    if not db:
+        raise SystemExit("Firestore is not initialized")
+    backfill(db, args.dry_run)
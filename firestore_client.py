@@ -0,0 +1,146 @@
+import firebase_admin
+from firebase_admin import credentials, firestore
+from functools import lru_cache
+import logging
+import threading
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Calls that refine a query or reference; their arguments make up the cache key
+QUERY_BUILDERS = frozenset({
+    'collection', 'collection_group', 'document', 'where', 'select', 'order_by',
+    'limit', 'limit_to_last', 'offset', 'start_at', 'start_after', 'end_at', 'end_before',
+    'count', 'sum', 'avg',
+})
+
+# Last calls that bound what a read returns; other chains can match a whole
+# collection, so they stream through uncached instead of being held in memory
+CACHEABLE_ENDINGS = frozenset({'document', 'limit', 'limit_to_last', 'count', 'sum', 'avg'})
+
+
+@lru_cache(maxsize=None)
+def get_db():
+    """
+    Return the process-wide Firestore client, or None if initialization failed
+    """
+    try:
+        # Initialize Firebase Admin SDK
+        # Replace 'path/to/serviceAccountKey.json' with your actual service account key path
+        cred = credentials.Certificate('serviceAccountKey.json')  # You need to add your service account key
+        firebase_admin.initialize_app(cred)
+
+        db = firestore.client()
+        logger.info("Firestore initialized successfully")
+        return db
+    except Exception as e:
+        logger.error(f"Failed to initialize Firestore: {e}")
+        return None
+
+
+def _freeze(value):
+    """
+    Turn query arguments into a hashable cache key part; raises TypeError if it cannot
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    # FieldFilter compares by identity, so key it on what it filters
+    if hasattr(value, 'field_path') and hasattr(value, 'op_string'):
+        return ('filter', value.field_path, value.op_string, _freeze(value.value))
+    hash(value)
+    return value
+
+
+class CachedQuery:
+    """
+    Wrap a Firestore query or reference, remembering how it was built and
+    serving stream()/get() results from the proxy's cache
+    """
+    def __init__(self, proxy, target, key):
+        self._proxy = proxy
+        self._target = target
+        self._key = key
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in QUERY_BUILDERS:
+            return attr
+
+        def build(*args, **kwargs):
+            return CachedQuery(self._proxy, attr(*args, **kwargs), self._child_key((name, args, kwargs)))
+        return build
+
+    def _child_key(self, step):
+        """
+        Extend the cache key by one step, or None once any argument is unhashable
+        """
+        if self._key is None:
+            return None
+        try:
+            return self._key + (_freeze(step),)
+        except TypeError:
+            return None
+
+    def _cacheable(self):
+        return bool(self._key) and self._key[-1][0] in CACHEABLE_ENDINGS
+
+    def stream(self, *args, **kwargs):
+        # Transactions and retry settings bypass the cache
+        if args or kwargs or not self._cacheable():
+            return self._target.stream(*args, **kwargs)
+        return iter(self._proxy._fetch(self._child_key('stream'), lambda: tuple(self._target.stream())))
+
+    def get(self, *args, **kwargs):
+        if args or kwargs or not self._cacheable():
+            return self._target.get(*args, **kwargs)
+
+        def load():
+            result = self._target.get()
+            return tuple(result) if isinstance(result, list) else result
+
+        # Cached lists are kept as tuples and copied out, so callers mutating
+        # what they got back cannot change what later queries see
+        result = self._proxy._fetch(self._child_key('get'), load)
+        return list(result) if isinstance(result, tuple) else result
+
+
+class CachedFirestoreProxy:
+    """
+    Firestore client stand-in for generated query code that reuses bounded read
+    results (limited queries, aggregations and single documents) for a short TTL,
+    so repeated dashboard queries skip the round trip. clear() only affects this
+    process; other workers serve their entries until the TTL expires
+    """
+    def __init__(self, db, maxsize=256, ttl=30):
+        self._db = db
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name not in QUERY_BUILDERS:
+            return attr
+        return CachedQuery(self, self._db, ()).__getattr__(name)
+
+    def _fetch(self, key, load):
+        """
+        Return the cached result for key, loading it on a miss; None keys are never cached
+        """
+        if key is None:
+            return load()
+        with self._lock:
+            result = self._cache.get(key)
+        if result is None:
+            result = load()
+            with self._lock:
+                self._cache[key] = result
+        return result
+
+    def clear(self):
+        """
+        Drop every cached result
+        """
+        with self._lock:
+            self._cache.clear()
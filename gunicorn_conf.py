@@ -0,0 +1,29 @@
+import os
+
+# Cloud Run and App Engine pass the port to listen on in $PORT
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Threaded workers overlap the Firestore network waits of concurrent requests, so
+# a few processes are enough. Each one holds its own Firestore client and about 33
+# pool threads, and cpu_count() does not reflect App Engine instance classes
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+timeout = 120
+keepalive = 2
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+
+def post_worker_init(worker):
+    """
+    Build the analytics and query handler singletons before the worker takes requests
+    """
+    from app import get_analytics, get_query_handler
+    get_analytics()
+    get_query_handler()
@@ -1,31 +1,290 @@
 import google.generativeai as genai
 import re
+import ast
 import json
-import pandas as pd
 from datetime import datetime, timedelta
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import traceback
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, namedtuple
 import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
+from firestore_client import get_db, CachedFirestoreProxy
+from result_utils import make_json_serializable, normalize_results
+from specialized_queries import conversations_by_hour, match_specialized_query
 
 logger = logging.getLogger(__name__)
 
+# Generator, coroutine, frame and traceback attributes that lead back to the
+# globals of the code that runs generated queries
+INTROSPECTION_ATTRIBUTES = frozenset({
+    'gi_frame', 'gi_code', 'cr_frame', 'cr_code', 'ag_frame', 'ag_code',
+    'f_back', 'f_globals', 'f_locals', 'f_builtins', 'f_code', 'tb_frame', 'tb_next',
+})
+
+
+def _checked_attr_name(name):
+    # The AST validator only sees literal attributes, so names passed as strings
+    # are checked here to keep __class__/__subclasses__ and frames out of reach
+    if isinstance(name, str) and (name.startswith('_') or name in INTROSPECTION_ATTRIBUTES):
+        raise ValueError(f"Generated code may not access '{name}'")
+    return name
+
+
+def safe_getattr(obj, name, *default):
+    return getattr(obj, _checked_attr_name(name), *default)
+
+
+def safe_setattr(obj, name, value):
+    setattr(obj, _checked_attr_name(name), value)
+
+
+def _namespace(name, **members):
+    """
+    Read-only stand-in for a module, exposing only the given members to generated code
+    """
+    return namedtuple(name, members)(**members)
+
+
+# Whole modules reach os and sys through their attributes, so generated code gets
+# only the functions it needs from each
+SAFE_JSON = _namespace('json', dumps=json.dumps, loads=json.loads)
+SAFE_RE = _namespace(
+    're', compile=re.compile, search=re.search, match=re.match, fullmatch=re.fullmatch,
+    findall=re.findall, finditer=re.finditer, sub=re.sub, split=re.split, escape=re.escape,
+    IGNORECASE=re.IGNORECASE, I=re.I,
+)
+SAFE_LOGGER = _namespace(
+    'logger', debug=logger.debug, info=logger.info, warning=logger.warning, error=logger.error,
+)
+
+
+# Builtins exposed to generated query code, read-only so no caller can widen the whitelist
+SAFE_BUILTINS = MappingProxyType({
+    # Basic Python functions
+    'len': len,
+    'range': range,
+    'enumerate': enumerate,
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'list': list,
+    'dict': dict,
+    'set': set,
+    'tuple': tuple,
+    'max': max,
+    'min': min,
+    'sum': sum,
+    'round': round,
+    'sorted': sorted,
+    'any': any,
+    'all': all,
+    # Additional useful functions
+    'abs': abs,
+    'bin': bin,
+    'hex': hex,
+    'oct': oct,
+    'ord': ord,
+    'chr': chr,
+    'zip': zip,
+    'map': map,
+    'filter': filter,
+    'isinstance': isinstance,
+    'hasattr': hasattr,
+    'getattr': safe_getattr,
+    'setattr': safe_setattr,
+    'print': print,  # For debugging
+    'iter': iter,
+    'next': next,
+    'reversed': reversed,
+    'slice': slice,
+    'divmod': divmod,
+    'pow': pow,
+    # Exception handling
+    'Exception': Exception,
+    'ValueError': ValueError,
+    'TypeError': TypeError,
+    'KeyError': KeyError,
+    'AttributeError': AttributeError,
+    'IndexError': IndexError,
+    'RuntimeError': RuntimeError,
+    'StopIteration': StopIteration,
+    'ZeroDivisionError': ZeroDivisionError,
+    'NameError': NameError,
+})
+
+# Markdown fences around generated code
+PYTHON_BLOCK_RE = re.compile(r'```python\n(.*?)\n```', re.DOTALL)
+CODE_BLOCK_RE = re.compile(r'```\n(.*?)\n```', re.DOTALL)
+
+# Static part of the Gemini prompt, sent as the system instruction; {db_structure}
+# is filled in once per handler
+SYSTEM_PROMPT = """
+            You are a Python code generator for Firebase Firestore queries. 
+            Given a natural language query about a medical chatbot database, generate Python code that queries the database and returns the results.
+
+            {db_structure}
+
+            Rules:
+            1. Use only the fields and collections mentioned in the database structure
+            2. DO NOT include import statements - all modules are pre-imported (datetime, timedelta, defaultdict, Counter, etc.)
+            3. The database object is already available as 'db'
+            4. Return data in a format suitable for display (lists, dictionaries)
+            5. Handle errors gracefully with try-except blocks
+            6. Use proper Firestore query syntax
+            7. For date comparisons, use datetime objects
+            8. Always include comments explaining the logic
+            9. Format results as JSON-serializable data structures
+            10. Limit results to reasonable amounts (e.g., top 100 records)
+            11. ALWAYS return a dictionary with 'data' and 'summary' keys
+            12. 'data' should be a list of dictionaries for tabular display
+            13. 'summary' should be a descriptive string about the results
+            14. ALWAYS use .select(['field1', 'field2']) to fetch only the fields the answer needs
+            15. Push filters to Firestore with .where() before any Python-side filtering
+            16. End queries that list documents with .limit(N) instead of slicing in Python
+
+            Available pre-imported modules:
+            - datetime, timedelta (from datetime)
+            - defaultdict, Counter (from collections)
+            - re (compile, search, match, fullmatch, findall, finditer, sub, split, escape, IGNORECASE)
+            - json (dumps, loads)
+            - logger (debug, info, warning, error)
+            - pandas is NOT available; aggregate with dicts, Counter and defaultdict
+
+            The code should be in a function called 'execute_query()' that returns the results.
+            DO NOT include any import statements.
+            
+            Example format:
+            ```python
+            def execute_query():
+                try:
+                    # Your query logic here (no imports needed)
+                    
+                    # Process data and create results list
+                    data_list = [
+                        {'field1': 'value1', 'field2': 'value2'},
+                        {'field1': 'value3', 'field2': 'value4'}
+                    ]
+                    
+                    results = {
+                        'data': data_list,  # Always a list of dictionaries
+                        'summary': 'Found X records matching criteria'
+                    }
+                    return results
+                except Exception as e:
+                    return {'error': str(e), 'data': [], 'summary': 'Query failed'}
+            ```
+            """
+
+# Request for a single query
+QUERY_PROMPT = """
+            Natural Language Query: "{natural_query}"
+
+            Generate Python code that answers this query. Respond with a JSON object whose 'code' field holds only the Python code, no explanations.
+            """
+
+# Several queries answered by one Gemini request
+BATCH_PROMPT = """
+            Natural Language Queries:
+{natural_queries}
+
+            Generate Python code that answers each of these queries separately.
+            Respond with a JSON object, without explanations, of the form:
+            {"queries": [{"index": 1, "code": "def execute_query():\\n    ..."}]}
+            The index is the number of the query in the list above.
+            """
+
+# Structured output, so generated code comes back as JSON instead of markdown
+CODE_RESPONSE_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': {
+        'type': 'object',
+        'properties': {'code': {'type': 'string'}},
+        'required': ['code']
+    }
+}
+
+BATCH_RESPONSE_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': {
+        'type': 'object',
+        'properties': {
+            'queries': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {'index': {'type': 'integer'}, 'code': {'type': 'string'}},
+                    'required': ['index', 'code']
+                }
+            }
+        },
+        'required': ['queries']
+    }
+}
+
+# Example queries offered in the dashboard
+SAMPLE_QUERIES = (
+    "Show me the top 10 most frequently searched unfound drugs",
+    "How many users registered in the last month?",
+    "What are the most common words in user messages?",
+    "Show me unfound drugs searched more than 5 times",
+    "What's the average number of messages per chat session?",
+    "Show me the distribution of users by gender",
+    "Which users have incomplete profiles?",
+    "What's the hourly distribution of conversations?",
+    "Show unfound drugs by their search frequency",
+    "What are the latest unfound drug searches?",
+    "Show me health check status distribution",
+    "List all tablet names in unfound drugs",
+    "Show users who speak Tamil (bot_response_tamil is not null)",
+    "Which unfound drugs have combination names?",
+)
+
+class GeneratedCodeValidator(ast.NodeTransformer):
+    """
+    Drop import statements, since modules are pre-imported, and reject constructs
+    that reach outside the execution environment
+    """
+    def visit_Import(self, node):
+        # Keep a placeholder so blocks holding only imports stay valid
+        return ast.copy_location(ast.Pass(), node)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_Global(self, node):
+        raise ValueError("Generated code may not use global or nonlocal statements")
+
+    visit_Nonlocal = visit_Global
+
+    def visit_Attribute(self, node):
+        if node.attr.startswith('_') or node.attr in INTROSPECTION_ATTRIBUTES:
+            raise ValueError(f"Generated code may not access '{node.attr}'")
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node.id.startswith('__'):
+            raise ValueError(f"Generated code may not use '{node.id}'")
+        return node
+
 class DatabaseQueryHandler:
-    def __init__(self, db, gemini_api_key=None):
-        self.db = db
-        
-        # Set up Gemini
-        api_key = gemini_api_key or os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-        else:
-            logger.warning("No Gemini API key provided. Natural language queries will not work.")
-            self.model = None
-        
-        # Database structure information
-        self.db_structure = """
+    # Generated code kept per handler, keyed by the normalized query text
+    CODE_CACHE_SIZE = 512
+    # Most queries accepted by process_natural_queries
+    MAX_BATCH_QUERIES = 10
+    # SQLite file keeping generated code across restarts; unset disables it
+    QUERY_CACHE_PATH = os.getenv('QUERY_CACHE_PATH')
+    GEMINI_MODEL = 'gemini-2.0-flash'
+
+    # Database structure information
+    db_structure = """
         Database Structure (Updated):
         
         📂 Collection: health_check
@@ -77,94 +336,143 @@ class DatabaseQueryHandler:
         - Get all documents: collection.stream()
         - Collection group queries: db.collection_group('collection_name')
         - Date filtering: collection.where('timestamp', '>=', datetime_obj)
+        - Project fields: collection.select(['field1', 'field2']).stream()
+        - Limit results: collection.limit(100).stream()
+        - Example: db.collection('users').where('is_active', '==', True).select(['user_id', 'first_name']).limit(100).stream()
+        - Example: db.collection('unfound_drugs').where('frequency', '>', 5).select(['tablet_name', 'frequency']).limit(100).stream()
         """
+
+    def __init__(self, db=None, gemini_api_key=None, hourly_usage=None):
+        self.db = db if db is not None else get_db()
+        # Callable returning the dashboard's 24 hourly conversation counts, or None when unavailable
+        self._hourly_usage = hourly_usage
+        self._code_cache = LRUCache(maxsize=self.CODE_CACHE_SIZE)
+        self._code_cache_lock = threading.Lock()
+        self._disk_cache = self._open_disk_cache(self.QUERY_CACHE_PATH) if self.QUERY_CACHE_PATH else None
+        self._disk_cache_lock = threading.Lock()
+        self._compiled_cache = LRUCache(maxsize=self.CODE_CACHE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_BATCH_QUERIES)
+
+        self._cached_db = CachedFirestoreProxy(self.db) if self.db is not None else None
+
+        # Execution environment with pre-imported modules, copied for each run
+        self._safe_globals = {
+            # Database access, with reads shared between queries for a few seconds
+            'db': self._cached_db,
+            # Pre-imported names to avoid import statements; modules are narrowed to namespaces
+            'datetime': datetime,
+            'timedelta': timedelta,
+            'defaultdict': defaultdict,
+            'Counter': Counter,
+            'json': SAFE_JSON,
+            'logger': SAFE_LOGGER,
+            're': SAFE_RE
+        }
+        
+        # The database structure never changes, so fill it into the system prompt
+        # once; requests are split around the query, which is all that changes
+        self._system_prompt = SYSTEM_PROMPT.replace('{db_structure}', self.db_structure)
+        self._prompt_head, self._prompt_tail = QUERY_PROMPT.split('{natural_query}')
+        self._batch_prompt_head, self._batch_prompt_tail = BATCH_PROMPT.split('{natural_queries}')
+        self._prompt_key = hashlib.blake2b((self._system_prompt + QUERY_PROMPT).encode(), digest_size=32).digest()
+        
+        # Set up Gemini
+        api_key = gemini_api_key or os.getenv('GEMINI_API_KEY')
+        if api_key:
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(self.GEMINI_MODEL, system_instruction=self._system_prompt)
+        else:
+            logger.warning("No Gemini API key provided. Natural language queries will not work.")
+            self.model = None
     
-    def generate_code_from_query(self, natural_query: str) -> Dict[str, Any]:
+    def _query_cache_key(self, natural_query: str) -> str:
         """
-        Generate Python code from natural language query using Google Gemini
+        Hash a query so that case and whitespace differences share one cache entry
         """
-        try:
-            if not self.model:
-                return {
-                    'success': False,
-                    'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.',
-                    'code': None,
-                    'query': natural_query
-                }
-            
-            prompt = f"""
-            You are a Python code generator for Firebase Firestore queries. 
-            Given a natural language query about a medical chatbot database, generate Python code that queries the database and returns the results.
+        normalized = ' '.join(natural_query.split()).lower()
+        # Keyed by the prompt, so persisted code is not reused after the prompt changes
+        return hashlib.blake2b(normalized.encode(), digest_size=16, key=self._prompt_key).hexdigest()
 
-            {self.db_structure}
+    def _open_disk_cache(self, path: str):
+        """
+        Open the SQLite store for generated code, or None if it cannot be used
+        """
+        try:
+            conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+            # WAL lets gunicorn workers read while another one writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS qcache (h TEXT PRIMARY KEY, code TEXT, ts REAL)')
+            logger.info(f"Generated code cache at {path}")
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"Generated code cache disabled, cannot open {path}: {e}")
+            return None
 
-            Rules:
-            1. Use only the fields and collections mentioned in the database structure
-            2. DO NOT include import statements - all modules are pre-imported (datetime, timedelta, defaultdict, Counter, etc.)
-            3. The database object is already available as 'db'
-            4. Return data in a format suitable for display (lists, dictionaries)
-            5. Handle errors gracefully with try-except blocks
-            6. Use proper Firestore query syntax
-            7. For date comparisons, use datetime objects
-            8. Always include comments explaining the logic
-            9. Format results as JSON-serializable data structures
-            10. Limit results to reasonable amounts (e.g., top 100 records)
-            11. ALWAYS return a dictionary with 'data' and 'summary' keys
-            12. 'data' should be a list of dictionaries for tabular display
-            13. 'summary' should be a descriptive string about the results
+    def _cached_code(self, key: str):
+        """
+        Look up generated code in memory, then in the SQLite store
+        """
+        with self._code_cache_lock:
+            code = self._code_cache.get(key)
+        if code is not None or self._disk_cache is None:
+            return code
+        
+        try:
+            with self._disk_cache_lock:
+                row = self._disk_cache.execute('SELECT code FROM qcache WHERE h = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading generated code cache: {e}")
+            return None
+        
+        if row is None:
+            return None
+        with self._code_cache_lock:
+            self._code_cache[key] = row[0]
+        return row[0]
 
-            Available pre-imported modules:
-            - datetime, timedelta (from datetime)
-            - defaultdict, Counter (from collections)
-            - re, json, pd (pandas), logger
+    def _store_code(self, key: str, code: str):
+        """
+        Remember generated code in memory and in the SQLite store
+        """
+        with self._code_cache_lock:
+            self._code_cache[key] = code
+        if self._disk_cache is None:
+            return
+        
+        try:
+            with self._disk_cache_lock:
+                self._disk_cache.execute(
+                    'INSERT OR REPLACE INTO qcache (h, code, ts) VALUES (?, ?, ?)',
+                    (key, code, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing generated code cache: {e}")
 
-            Natural Language Query: "{natural_query}"
+    def generate_code_from_query(self, natural_query: str) -> Dict[str, Any]:
+        """
+        Generate Python code from natural language query using Google Gemini
+        """
+        if not self.model:
+            return {
+                'success': False,
+                'error': 'Gemini API not configured. Please set GEMINI_API_KEY environment variable.',
+                'code': None,
+                'query': natural_query
+            }
 
-            Generate Python code that answers this query. Return only the Python code, no explanations.
-            The code should be in a function called 'execute_query()' that returns the results.
-            DO NOT include any import statements.
-            
-            Example format:
-            ```python
-            def execute_query():
-                try:
-                    # Your query logic here (no imports needed)
-                    
-                    # Process data and create results list
-                    data_list = [
-                        {{'field1': 'value1', 'field2': 'value2'}},
-                        {{'field1': 'value3', 'field2': 'value4'}}
-                    ]
-                    
-                    results = {{
-                        'data': data_list,  # Always a list of dictionaries
-                        'summary': 'Found X records matching criteria'
-                    }}
-                    return results
-                except Exception as e:
-                    return {{'error': str(e), 'data': [], 'summary': 'Query failed'}}
-            ```
-            """
-            
-            response = self.model.generate_content(prompt)
-            generated_code = response.text.strip()
-            
-            # Extract code from markdown blocks if present
-            if "```python" in generated_code:
-                code_match = re.search(r'```python\n(.*?)\n```', generated_code, re.DOTALL)
-                if code_match:
-                    generated_code = code_match.group(1)
-            elif "```" in generated_code:
-                code_match = re.search(r'```\n(.*?)\n```', generated_code, re.DOTALL)
-                if code_match:
-                    generated_code = code_match.group(1)
-            
+        key = self._query_cache_key(natural_query)
+        code = self._cached_code(key)
+        if code is not None:
+            logger.info(f"Reusing cached code for query: {natural_query}")
             return {
                 'success': True,
-                'code': generated_code,
+                'code': code,
                 'query': natural_query
             }
-            
+
+        try:
+            code = self._generate_code_uncached(natural_query)
         except Exception as e:
             logger.error(f"Error generating code with Gemini: {e}")
             return {
@@ -173,89 +481,115 @@ class DatabaseQueryHandler:
                 'code': None,
                 'query': natural_query
             }
+
+        # Only successful generations are cached, so failures are retried
+        self._store_code(key, code)
+        return {
+            'success': True,
+            'code': code,
+            'query': natural_query
+        }
+
+    def _generate_code_uncached(self, natural_query: str) -> str:
+        """
+        Ask Gemini for the code answering a query; raises on failure
+        """
+        prompt = self._prompt_head + natural_query + self._prompt_tail
+        
+        response = self._generate_content(prompt, CODE_RESPONSE_CONFIG)
+        return self._extract_code(json.loads(response.text)['code'])
+
+    def _generate_content(self, prompt: str, generation_config: Dict[str, Any]):
+        """
+        Send a user turn to the model, which already carries the system prompt
+        """
+        return self.model.generate_content(prompt, generation_config=generation_config)
+
+    async def _generate_content_async(self, prompt: str, generation_config: Dict[str, Any]):
+        """
+        Awaitable _generate_content
+        """
+        return await self.model.generate_content_async(prompt, generation_config=generation_config)
+
+    def _extract_code(self, text: str) -> str:
+        """
+        Strip the markdown fences Gemini may still put around code inside its JSON reply
+        """
+        generated_code = text.strip()
+        
+        # Extract code from markdown blocks if present
+        if "```python" in generated_code:
+            code_match = PYTHON_BLOCK_RE.search(generated_code)
+            if code_match:
+                generated_code = code_match.group(1)
+        elif "```" in generated_code:
+            code_match = CODE_BLOCK_RE.search(generated_code)
+            if code_match:
+                generated_code = code_match.group(1)
+        
+        return generated_code
+
+    def _prefetch_code(self, natural_queries: List[str]):
+        """
+        Generate code for all uncached queries with a single Gemini request
+        """
+        pending = {}
+        for natural_query in natural_queries:
+            if match_specialized_query(natural_query) is not None:
+                continue
+            key = self._query_cache_key(natural_query)
+            if key not in pending and self._cached_code(key) is None:
+                pending[key] = natural_query
+
+        # A lone query goes through the regular prompt
+        if len(pending) < 2:
+            return
+
+        keys = list(pending)
+        numbered = '\n'.join(
+            f'            {index}. "{natural_query}"'
+            for index, natural_query in enumerate(pending.values(), 1)
+        )
+        prompt = self._batch_prompt_head + numbered + self._batch_prompt_tail
+
+        try:
+            response = self._generate_content(prompt, BATCH_RESPONSE_CONFIG)
+            codes = self._parse_batch_response(response.text, len(keys))
+        except Exception as e:
+            # Queries left uncached are generated one by one
+            logger.error(f"Error generating batched code with Gemini: {e}")
+            return
+
+        logger.info(f"Generated code for {len(codes)} of {len(keys)} batched queries")
+        for index, code in codes.items():
+            self._store_code(keys[index - 1], code)
+
+    def _parse_batch_response(self, text: str, count: int) -> Dict[int, str]:
+        """
+        Map query numbers to code from a batched Gemini JSON response
+        """
+        codes = {}
+        for item in json.loads(text).get('queries', []):
+            index = item.get('index')
+            code = item.get('code')
+            if isinstance(index, int) and 1 <= index <= count and isinstance(code, str) and code.strip():
+                codes[index] = self._extract_code(code)
+        return codes
     
-    def execute_generated_code(self, code: str) -> Dict[str, Any]:
+    def execute_generated_code(self, code: str, debug: Optional[bool] = None) -> Dict[str, Any]:
         """
-        Safely execute the generated code and return results
+        Safely execute the generated code and return results; failures carry a
+        traceback only with debug, which defaults to DEBUG logging being enabled
         """
         try:
-            # Create a safe execution environment with pre-imported modules
-            safe_globals = {
-                '__builtins__': {
-                    # Basic Python functions
-                    'len': len,
-                    'range': range,
-                    'enumerate': enumerate,
-                    'str': str,
-                    'int': int,
-                    'float': float,
-                    'bool': bool,
-                    'list': list,
-                    'dict': dict,
-                    'set': set,
-                    'tuple': tuple,
-                    'max': max,
-                    'min': min,
-                    'sum': sum,
-                    'round': round,
-                    'sorted': sorted,
-                    'any': any,
-                    'all': all,
-                    # Additional useful functions
-                    'abs': abs,
-                    'bin': bin,
-                    'hex': hex,
-                    'oct': oct,
-                    'ord': ord,
-                    'chr': chr,
-                    'zip': zip,
-                    'map': map,
-                    'filter': filter,
-                    'isinstance': isinstance,
-                    'hasattr': hasattr,
-                    'getattr': getattr,
-                    'setattr': setattr,
-                    'type': type,
-                    'print': print,  # For debugging
-                    'iter': iter,
-                    'next': next,
-                    'reversed': reversed,
-                    'slice': slice,
-                    'divmod': divmod,
-                    'pow': pow,
-                    # Exception handling
-                    'Exception': Exception,
-                    'ValueError': ValueError,
-                    'TypeError': TypeError,
-                    'KeyError': KeyError,
-                    'AttributeError': AttributeError,
-                    'IndexError': IndexError,
-                    'RuntimeError': RuntimeError,
-                    'StopIteration': StopIteration,
-                    'ZeroDivisionError': ZeroDivisionError,
-                    'NameError': NameError,
-                },
-                # Database access
-                'db': self.db,
-                # Pre-imported modules to avoid import statements
-                'datetime': datetime,
-                'timedelta': timedelta,
-                'defaultdict': defaultdict,
-                'Counter': Counter,
-                'pd': pd,
-                'json': json,
-                'logger': logger,
-                're': re
-            }
-            
+            # Fresh globals per run so generated code cannot leak state between queries
+            safe_globals = dict(self._safe_globals)
+            # Builtins must be a real dict to keep CPython's fast global lookups
+            safe_globals['__builtins__'] = dict(SAFE_BUILTINS)
             safe_locals = {}
             
-            # Remove import statements from code since modules are pre-imported
-            # This prevents the import error while maintaining functionality
-            cleaned_code = self._clean_imports_from_code(code)
-            
-            # Execute the cleaned code
-            exec(cleaned_code, safe_globals, safe_locals)
+            # Execute the validated code
+            exec(self._compile_code(code), safe_globals, safe_locals)
             
             # Call the execute_query function
             if 'execute_query' in safe_locals:
@@ -264,27 +598,27 @@ class DatabaseQueryHandler:
                 # Ensure results are JSON serializable
                 if isinstance(results, dict):
                     # Convert any datetime objects to strings
-                    results = self._make_json_serializable(results)
+                    results = make_json_serializable(results)
                     
                     # Validate and normalize the results structure
-                    results = self._normalize_results(results)
+                    results = normalize_results(results)
                     
                     return {
                         'success': True,
                         'results': results,
-                        'executed_code': cleaned_code
+                        'executed_code': code
                     }
                 else:
                     return {
                         'success': False,
                         'error': 'Function did not return a dictionary',
-                        'executed_code': cleaned_code
+                        'executed_code': code
                     }
             else:
                 return {
                     'success': False,
                     'error': 'No execute_query function found in generated code',
-                    'executed_code': cleaned_code
+                    'executed_code': code
                 }
                 
         except Exception as e:
@@ -292,130 +626,38 @@ class DatabaseQueryHandler:
             logger.error(f"Error executing generated code: {error_msg}")
             logger.error(f"Code that failed: {code[:200]}...")  # Log first 200 chars
             
-            return {
+            result = {
                 'success': False,
                 'error': f"Execution error: {error_msg}",
-                'traceback': traceback.format_exc(),
-                'executed_code': code,
-                'debug_info': {
+                'executed_code': code
+            }
+            
+            # Formatting the stack is only worth it when someone will read it
+            if debug is None:
+                debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                result['traceback'] = traceback.format_exc()
+                result['debug_info'] = {
                     'error_type': type(e).__name__,
                     'available_globals': list(safe_globals.keys()) if 'safe_globals' in locals() else [],
                     'code_preview': code[:200] + '...' if len(code) > 200 else code
                 }
-            }
-    
-    def _clean_imports_from_code(self, code: str) -> str:
-        """
-        Remove import statements from code since modules are pre-imported
-        """
-        lines = code.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            stripped_line = line.strip()
-            # Skip import statements
-            if (stripped_line.startswith('import ') or 
-                stripped_line.startswith('from ') or
-                stripped_line == ''):
-                # Replace with comment to maintain line numbers for debugging
-                if stripped_line and not stripped_line == '':
-                    cleaned_lines.append(f"# {line}  # Pre-imported")
-                else:
-                    cleaned_lines.append(line)  # Keep empty lines
-            else:
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+            
+            return result
     
-    def _normalize_results(self, results: dict) -> dict:
+    def _compile_code(self, code: str):
         """
-        Normalize and validate the results structure to ensure it can be displayed
+        Validate and compile generated code once, reusing the code object for repeated runs
         """
-        # If results is empty or has no data key, create a basic structure
-        if not results or not isinstance(results, dict):
-            return {
-                'data': [],
-                'summary': 'No results returned'
-            }
-        
-        # Ensure we have a data key
-        if 'data' not in results:
-            # If we have other keys that look like data, move them to data
-            possible_data_keys = ['users', 'items', 'records', 'rows', 'entries', 'results']
-            data_found = False
-            
-            for key in possible_data_keys:
-                if key in results:
-                    results['data'] = results[key]
-                    if key != 'data':
-                        del results[key]  # Remove the old key
-                    data_found = True
-                    break
-            
-            if not data_found:
-                # If it's a simple value (number, string), wrap it
-                if isinstance(results, (int, float, str, bool)):
-                    return {
-                        'data': [{'result': results}],
-                        'summary': f'Query returned: {results}'
-                    }
-                
-                # If it's a dict with multiple keys, treat each key-value as data
-                elif isinstance(results, dict):
-                    data_items = []
-                    for key, value in results.items():
-                        if key not in ['summary', 'error']:
-                            data_items.append({key: value})
-                    
-                    if data_items:
-                        results['data'] = data_items
-                    else:
-                        results['data'] = []
-        
-        # Ensure data is a list
-        if 'data' in results and not isinstance(results['data'], list):
-            # If it's a single dict, wrap it in a list
-            if isinstance(results['data'], dict):
-                results['data'] = [results['data']]
-            # If it's some other type, convert to string and wrap
-            else:
-                results['data'] = [{'value': str(results['data'])}]
-        
-        # If data is empty but we have other info, create meaningful data
-        if not results.get('data'):
-            if 'summary' in results:
-                results['data'] = [{'summary': results['summary']}]
-            else:
-                results['data'] = [{'message': 'No data found for this query'}]
-        
-        # Ensure we have a summary
-        if 'summary' not in results:
-            data_count = len(results.get('data', []))
-            if data_count == 0:
-                results['summary'] = 'No results found'
-            elif data_count == 1:
-                results['summary'] = 'Found 1 result'
-            else:
-                results['summary'] = f'Found {data_count} results'
-        
-        return results
-    
-    def _make_json_serializable(self, obj):
-        """
-        Convert objects to JSON serializable format
-        """
-        if isinstance(obj, dict):
-            return {key: self._make_json_serializable(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._make_json_serializable(item) for item in obj]
-        elif isinstance(obj, tuple):
-            return [self._make_json_serializable(item) for item in obj]
-        elif isinstance(obj, datetime):
-            return obj.strftime('%Y-%m-%d %H:%M:%S')
-        elif hasattr(obj, '__dict__'):
-            return str(obj)
-        else:
-            return obj
+        key = hashlib.sha1(code.encode()).digest()
+        with self._code_cache_lock:
+            code_obj = self._compiled_cache.get(key)
+        if code_obj is None:
+            tree = GeneratedCodeValidator().visit(ast.parse(code, '<generated>'))
+            code_obj = compile(ast.fix_missing_locations(tree), '<generated>', 'exec')
+            with self._code_cache_lock:
+                self._compiled_cache[key] = code_obj
+        return code_obj
     
     def process_natural_query(self, natural_query: str) -> Dict[str, Any]:
         """
@@ -423,6 +665,13 @@ class DatabaseQueryHandler:
         """
         logger.info(f"Processing natural query: {natural_query}")
         
+        # Known questions have hand-written answers that skip Gemini
+        handler = match_specialized_query(natural_query)
+        if handler is not None and self._cached_db is not None:
+            result = self._run_specialized(natural_query, handler)
+            if result is not None:
+                return result
+        
         # Generate code
         code_result = self.generate_code_from_query(natural_query)
         
@@ -446,23 +695,85 @@ class DatabaseQueryHandler:
             'execution_details': execution_result
         }
 
+    def _run_specialized(self, natural_query: str, handler) -> Optional[Dict[str, Any]]:
+        """
+        Answer a query with its hand-written handler, or None to fall back to Gemini
+        """
+        try:
+            if handler is conversations_by_hour:
+                answer = handler(self._cached_db, hourly_usage=self._hourly_usage)
+            else:
+                answer = handler(self._cached_db)
+            results = normalize_results(make_json_serializable(answer))
+        except Exception as e:
+            logger.warning(f"Specialized handler {handler.__name__} failed, falling back to Gemini: {e}")
+            return None
+        
+        logger.info(f"Answered natural query with {handler.__name__}")
+        return {
+            'success': True,
+            'query': natural_query,
+            'generated_code': None,
+            'results': results,
+            'error': None,
+            'execution_details': {
+                'success': True,
+                'results': results,
+                'handler': handler.__name__
+            }
+        }
+
+    async def process_natural_query_async(self, natural_query: str) -> Dict[str, Any]:
+        """
+        Awaitable process_natural_query for async callers: the Gemini request is
+        awaited and the generated code runs in a worker thread
+        """
+        if self.model and match_specialized_query(natural_query) is None:
+            key = self._query_cache_key(natural_query)
+            if self._cached_code(key) is None:
+                prompt = self._prompt_head + natural_query + self._prompt_tail
+                try:
+                    response = await self._generate_content_async(prompt, CODE_RESPONSE_CONFIG)
+                    code = self._extract_code(json.loads(response.text)['code'])
+                except Exception as e:
+                    logger.error(f"Error generating code with Gemini: {e}")
+                    return {
+                        'success': False,
+                        'error': 'Failed to generate code',
+                        'details': {
+                            'success': False,
+                            'error': str(e),
+                            'code': None,
+                            'query': natural_query
+                        },
+                        'query': natural_query
+                    }
+                self._store_code(key, code)
+        
+        # Code is cached now, so this only executes it
+        return await asyncio.to_thread(self.process_natural_query, natural_query)
+
+    def process_natural_queries(self, natural_queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Process several natural language queries, generating their code in one Gemini request
+        """
+        logger.info(f"Processing {len(natural_queries)} natural queries")
+        
+        if self.model:
+            self._prefetch_code(natural_queries)
+        
+        # Generated queries mostly wait on Firestore, so run them side by side
+        return list(self._executor.map(self.process_natural_query, natural_queries))
+
+    def clear_cache(self):
+        """
+        Forget cached Firestore reads so the next generated query sees fresh data
+        """
+        if self._cached_db is not None:
+            self._cached_db.clear()
+
     def get_sample_queries(self) -> List[str]:
         """
         Return sample queries that users can try
         """
-        return [
-            "Show me the top 10 most frequently searched unfound drugs",
-            "How many users registered in the last month?",
-            "What are the most common words in user messages?",
-            "Show me unfound drugs searched more than 5 times",
-            "What's the average number of messages per chat session?",
-            "Show me the distribution of users by gender",
-            "Which users have incomplete profiles?",
-            "What's the hourly distribution of conversations?",
-            "Show unfound drugs by their search frequency",
-            "What are the latest unfound drug searches?",
-            "Show me health check status distribution",
-            "List all tablet names in unfound drugs",
-            "Show users who speak Tamil (bot_response_tamil is not null)",
-            "Which unfound drugs have combination names?"
-        ]
+        return list(SAMPLE_QUERIES)
@@ -0,0 +1,149 @@
+"""
+Post-processing for the results of generated query code.
+
+Kept free of I/O and dynamic tricks, with full annotations, so the module can be
+compiled with mypyc (mypyc result_utils.py) and imported unchanged.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import orjson
+
+# Leaf types returned as-is when making results JSON serializable
+JSON_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
+
+# Datetimes and dataclasses go through _orjson_default so they match the Python walk
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+def normalize_results(results: Any) -> Dict[str, Any]:
+    """
+    Normalize and validate the results structure to ensure it can be displayed
+    """
+    # Generated code that follows the prompt rules is already displayable
+    if isinstance(results, dict) and 'summary' in results:
+        data = results.get('data')
+        if data and isinstance(data, list):
+            return results
+    
+    # If results is empty or has no data key, create a basic structure
+    if not results or not isinstance(results, dict):
+        return {
+            'data': [],
+            'summary': 'No results returned'
+        }
+    
+    # Ensure we have a data key
+    if 'data' not in results:
+        # If we have other keys that look like data, move them to data
+        possible_data_keys = ['users', 'items', 'records', 'rows', 'entries', 'results']
+        data_found = False
+        
+        for key in possible_data_keys:
+            if key in results:
+                results['data'] = results[key]
+                if key != 'data':
+                    del results[key]  # Remove the old key
+                data_found = True
+                break
+        
+        if not data_found:
+            # If it's a simple value (number, string), wrap it
+            if isinstance(results, (int, float, str, bool)):
+                return {
+                    'data': [{'result': results}],
+                    'summary': f'Query returned: {results}'
+                }
+            
+            # If it's a dict with multiple keys, treat each key-value as data
+            elif isinstance(results, dict):
+                data_items = []
+                for key, value in results.items():
+                    if key not in ['summary', 'error']:
+                        data_items.append({key: value})
+                
+                if data_items:
+                    results['data'] = data_items
+                else:
+                    results['data'] = []
+    
+    # Ensure data is a list
+    if 'data' in results and not isinstance(results['data'], list):
+        # If it's a single dict, wrap it in a list
+        if isinstance(results['data'], dict):
+            results['data'] = [results['data']]
+        # If it's some other type, convert to string and wrap
+        else:
+            results['data'] = [{'value': str(results['data'])}]
+    
+    # If data is empty but we have other info, create meaningful data
+    if not results.get('data'):
+        if 'summary' in results:
+            results['data'] = [{'summary': results['summary']}]
+        else:
+            results['data'] = [{'message': 'No data found for this query'}]
+    
+    # Ensure we have a summary
+    if 'summary' not in results:
+        data_count = len(results.get('data', []))
+        if data_count == 0:
+            results['summary'] = 'No results found'
+        elif data_count == 1:
+            results['summary'] = 'Found 1 result'
+        else:
+            results['summary'] = f'Found {data_count} results'
+    
+    return results
+
+
+def _orjson_default(value: Any) -> Any:
+    """
+    Encode the values orjson leaves to us the same way the Python walk does
+    """
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if hasattr(value, '__dict__'):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def make_json_serializable(obj: Any) -> Any:
+    """
+    Convert objects to JSON serializable format
+    """
+    # Round-trip through orjson, which converts the whole tree in C; anything it
+    # cannot encode (sets, bytes, huge ints, cycles) falls back to the Python walk
+    try:
+        return orjson.loads(orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS))
+    except orjson.JSONEncodeError:
+        pass
+    
+    # Walk with an explicit stack of (container, key) slots so deep results
+    # cannot hit the recursion limit; each container is copied once, even if shared
+    root: List[Any] = [obj]
+    stack: List[Tuple[Any, Any]] = [(root, 0)]
+    converted: Dict[int, Any] = {}
+    
+    while stack:
+        container, key = stack.pop()
+        value = container[key]
+        if type(value) in JSON_SCALAR_TYPES:
+            continue
+        
+        if isinstance(value, (dict, list, tuple)):
+            copy = converted.get(id(value))
+            if copy is None:
+                if isinstance(value, dict):
+                    copy = dict(value)
+                    stack.extend((copy, k) for k in copy)
+                else:
+                    copy = list(value)
+                    stack.extend((copy, i) for i in range(len(copy)))
+                converted[id(value)] = copy
+            container[key] = copy
+        elif isinstance(value, datetime):
+            container[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+        elif hasattr(value, '__dict__'):
+            container[key] = str(value)
+    
+    return root[0]
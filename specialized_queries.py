@@ -0,0 +1,213 @@
+"""
+Hand-written answers for the sample queries, so the most common questions skip
+Gemini and generated code entirely. Each handler takes the Firestore client and
+returns the same {'data': [...], 'summary': ...} shape generated code does.
+"""
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+
+# Similarity of content-word order a query needs to a known phrase to use its handler
+MATCH_RATIO = 0.85
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Words that can be added, dropped or swapped without changing what a query asks
+FILLER_WORDS = frozenset({
+    'a', 'an', 'the', 'me', 'us', 'show', 'list', 'display', 'give', 'get', 'find',
+    'tell', 'please', 'can', 'you', 'i', 'want', 'to', 'see', 'what', "what's",
+    'whats', 'which', 'are', 'is', 'all',
+})
+
+UNFOUND_DRUG_FIELDS = ['tablet_name', 'combination_name', 'frequency', 'last_searched']
+
+
+def _drug_rows(docs):
+    return [
+        {field: doc.get(field) for field in UNFOUND_DRUG_FIELDS}
+        for doc in (snap.to_dict() or {} for snap in docs)
+    ]
+
+
+def top_unfound_drugs(db):
+    """
+    Ten most frequently searched unfound drugs
+    """
+    query = db.collection('unfound_drugs').select(UNFOUND_DRUG_FIELDS).order_by('frequency', direction='DESCENDING').limit(10)
+    data = _drug_rows(query.stream())
+    return {'data': data, 'summary': f'Top {len(data)} most frequently searched unfound drugs'}
+
+
+def frequent_unfound_drugs(db):
+    """
+    Unfound drugs searched more than 5 times
+    """
+    query = db.collection('unfound_drugs').where('frequency', '>', 5).select(UNFOUND_DRUG_FIELDS).order_by('frequency', direction='DESCENDING').limit(100)
+    data = _drug_rows(query.stream())
+    return {'data': data, 'summary': f'Found {len(data)} unfound drugs searched more than 5 times'}
+
+
+def unfound_drugs_by_frequency(db):
+    """
+    Unfound drugs ordered by search frequency
+    """
+    query = db.collection('unfound_drugs').select(UNFOUND_DRUG_FIELDS).order_by('frequency', direction='DESCENDING').limit(100)
+    data = _drug_rows(query.stream())
+    return {'data': data, 'summary': f'{len(data)} unfound drugs ordered by search frequency'}
+
+
+def latest_unfound_drugs(db):
+    """
+    Most recently searched unfound drugs
+    """
+    query = db.collection('unfound_drugs').select(UNFOUND_DRUG_FIELDS).order_by('last_searched', direction='DESCENDING').limit(20)
+    data = _drug_rows(query.stream())
+    return {'data': data, 'summary': f'{len(data)} most recent unfound drug searches'}
+
+
+def unfound_tablet_names(db):
+    """
+    Every tablet name in unfound drugs
+    """
+    query = db.collection('unfound_drugs').select(['tablet_name']).limit(100)
+    data = [{'tablet_name': (snap.to_dict() or {}).get('tablet_name')} for snap in query.stream()]
+    return {'data': data, 'summary': f'Found {len(data)} tablet names in unfound drugs'}
+
+
+def unfound_drugs_with_combinations(db):
+    """
+    Unfound drugs that have a combination name
+    """
+    query = db.collection('unfound_drugs').select(['tablet_name', 'combination_name', 'frequency'])
+    data = []
+    for snap in query.stream():
+        drug = snap.to_dict() or {}
+        if drug.get('combination_name'):
+            data.append({
+                'tablet_name': drug.get('tablet_name'),
+                'combination_name': drug['combination_name'],
+                'frequency': drug.get('frequency')
+            })
+    return {'data': data[:100], 'summary': f'Found {len(data)} unfound drugs with combination names'}
+
+
+def recent_user_registrations(db):
+    """
+    Number of users created in the last 30 days
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    result = db.collection('users').where('created_at', '>=', since).count().get()
+    count = int(result[0][0].value)
+    return {'data': [{'new_users': count, 'since': since}], 'summary': f'{count} users registered in the last month'}
+
+
+def users_by_gender(db):
+    """
+    User counts per gender
+    """
+    genders = Counter(
+        (snap.to_dict() or {}).get('gender') or 'Unknown'
+        for snap in db.collection('users').select(['gender']).stream()
+    )
+    data = [{'gender': gender, 'users': count} for gender, count in genders.most_common()]
+    return {'data': data, 'summary': f'{sum(genders.values())} users across {len(genders)} genders'}
+
+
+def incomplete_profiles(db):
+    """
+    Users whose profile is not complete
+    """
+    query = db.collection('users').where('profile_complete', '==', False).select(['user_id', 'display_name', 'contact', 'created_at']).limit(100)
+    data = [snap.to_dict() or {} for snap in query.stream()]
+    return {'data': data, 'summary': f'Found {len(data)} users with incomplete profiles'}
+
+
+def average_messages_per_chat(db):
+    """
+    Mean message_count over all chat sessions, from server-side aggregations
+    """
+    result = db.collection_group('chats').count(alias='sessions').sum('message_count', alias='messages').get()
+    totals = {aggregate.alias: aggregate.value for aggregate in result[0]}
+    sessions = int(totals['sessions'])
+    messages = int(totals['messages'] or 0)
+    average = round(messages / sessions, 2) if sessions else 0
+    return {
+        'data': [{'chat_sessions': sessions, 'total_messages': messages, 'average_messages': average}],
+        'summary': f'Average of {average} messages per chat session across {sessions} chats'
+    }
+
+
+def conversations_by_hour(db, hourly_usage=None):
+    """
+    Conversation counts per hour of the day; hourly_usage, when given, returns
+    the 24 counts already computed for the dashboard so nothing is streamed
+    """
+    counts = hourly_usage() if hourly_usage else None
+    if counts is None:
+        hours = Counter()
+        for snap in db.collection_group('conversations').select(['timestamp']).stream():
+            timestamp = (snap.to_dict() or {}).get('timestamp')
+            if isinstance(timestamp, datetime):
+                hours[timestamp.hour] += 1
+        counts = [hours[hour] for hour in range(24)]
+    data = [{'hour': f'{hour:02d}:00', 'conversations': count} for hour, count in enumerate(counts)]
+    return {'data': data, 'summary': f'{sum(counts)} conversations by hour of day'}
+
+
+def health_check_statuses(db):
+    """
+    Health check counts per status
+    """
+    statuses = Counter(
+        (snap.to_dict() or {}).get('status') or 'Unknown'
+        for snap in db.collection('health_check').select(['status']).stream()
+    )
+    data = [{'status': status, 'count': count} for status, count in statuses.most_common()]
+    return {'data': data, 'summary': f'{sum(statuses.values())} health checks across {len(statuses)} statuses'}
+
+
+SPECIALIZED_QUERIES = (
+    ("Show me the top 10 most frequently searched unfound drugs", top_unfound_drugs),
+    ("Show me unfound drugs searched more than 5 times", frequent_unfound_drugs),
+    ("Show unfound drugs by their search frequency", unfound_drugs_by_frequency),
+    ("What are the latest unfound drug searches?", latest_unfound_drugs),
+    ("List all tablet names in unfound drugs", unfound_tablet_names),
+    ("Which unfound drugs have combination names?", unfound_drugs_with_combinations),
+    ("How many users registered in the last month?", recent_user_registrations),
+    ("Show me the distribution of users by gender", users_by_gender),
+    ("Which users have incomplete profiles?", incomplete_profiles),
+    ("What's the average number of messages per chat session?", average_messages_per_chat),
+    ("What's the hourly distribution of conversations?", conversations_by_hour),
+    ("Show me health check status distribution", health_check_statuses),
+)
+
+
+def _content_words(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in FILLER_WORDS]
+
+
+_PHRASES = tuple(
+    (_content_words(phrase), handler)
+    for phrase, handler in SPECIALIZED_QUERIES
+)
+
+
+def match_specialized_query(natural_query):
+    """
+    Return the handler for a query close enough to a known phrase, or None
+    """
+    words = _content_words(natural_query)
+    best_ratio, best_handler = MATCH_RATIO, None
+
+    for phrase_words, handler in _PHRASES:
+        # Any differing content word can change the answer ("complete" vs
+        # "incomplete", "top 5" vs "top 10"), so only filler words may differ;
+        # the ratio then rejects content words in a different order
+        if set(words) != set(phrase_words):
+            continue
+        ratio = SequenceMatcher(None, words, phrase_words).ratio()
+        if ratio > best_ratio:
+            best_ratio, best_handler = ratio, handler
+
+    return best_handler
@@ -874,9 +874,14 @@ async function refreshDashboard(isAutoRefresh = false) {
     showLoadingOverlay();
     
     try {
+        // Manual refreshes bypass the server-side analytics cache
+        if (!isAutoRefresh) {
+            await fetch('/api/cache-invalidate', { method: 'POST' });
+        }
+
         // Refresh all data
         await loadAllData();
-        
+
         // Update charts
         initializeCharts();
         
@@ -2266,56 +2271,67 @@ async function refreshUnfoundDrugsTable() {
 if (typeof loadAllData !== 'undefined') {
     const originalLoadAllData = loadAllData;
     loadAllData = async function() {
-        const endpoints = [
-            'weekly-users',
-            'user-queries', 
-            'medicine-search',
-            'daily-engagement',
-            'demographics',
-            'chat-sessions',
-            'peak-hours',
-            'retention',
-            'response-times',
-            'content-categories',
-            'age-category-queries',
-            'unfound-drugs',
-            'unfound-drugs-timeline',
-            'health-check'
-        ];
-
-        const promises = endpoints.map(endpoint => 
-            fetch(`/api/${endpoint}`)
-                .then(response => {
-                    if (!response.ok) {
-                        throw new Error(`Failed to fetch ${endpoint}: ${response.status}`);
-                    }
-                    return response.json();
-                })
-                .catch(error => {
-                    console.error(`Error loading ${endpoint}:`, error);
-                    return {};
-                })
-        );
-
-        const results = await Promise.all(promises);
-        
-        // Store data in global object
-        dashboardData = {
-            weeklyUsers: results[0],
-            userQueries: results[1],
-            medicineSearch: results[2],
-            dailyEngagement: results[3],
-            demographics: results[4],
-            chatSessions: results[5],
-            peakHours: results[6],
-            retention: results[7],
-            responseTimes: results[8],
-            contentCategories: results[9],
-            ageCategoryQueries: results[10],
-            unfoundDrugs: results[11],
-            unfoundDrugsTimeline: results[12],
-            healthCheck: results[13]
+        // Dashboard metric keys mapped to their individual endpoints
+        const endpoints = {
+            weeklyUsers: 'weekly-users',
+            userQueries: 'user-queries',
+            medicineSearch: 'medicine-search',
+            dailyEngagement: 'daily-engagement',
+            demographics: 'demographics',
+            chatSessions: 'chat-sessions',
+            peakHours: 'peak-hours',
+            retention: 'retention',
+            responseTimes: 'response-times',
+            contentCategories: 'content-categories',
+            ageCategoryQueries: 'age-category-queries',
+            unfoundDrugs: 'unfound-drugs',
+            unfoundDrugsTimeline: 'unfound-drugs-timeline',
+            healthCheck: 'health-check'
         };
+        const metrics = Object.keys(endpoints);
+
+        try {
+            // Fetch every metric in a single round trip
+            const response = await fetch('/api/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ metrics })
+            });
+            if (!response.ok) {
+                throw new Error(`Failed to fetch batch: ${response.status}`);
+            }
+            const result = await response.json();
+
+            // Store data in global object
+            dashboardData = {};
+            metrics.forEach(metric => {
+                dashboardData[metric] = result.data[metric] || {};
+            });
+        } catch (batchError) {
+            console.error('Error loading batched metrics, falling back to individual endpoints:', batchError);
+
+            const promises = metrics.map(metric =>
+                fetch(`/api/${endpoints[metric]}`)
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error(`Failed to fetch ${endpoints[metric]}: ${response.status}`);
+                        }
+                        return response.json();
+                    })
+                    .catch(error => {
+                        console.error(`Error loading ${endpoints[metric]}:`, error);
+                        return {};
+                    })
+            );
+
+            const results = await Promise.all(promises);
+
+            // Store data in global object
+            dashboardData = {};
+            metrics.forEach((metric, index) => {
+                dashboardData[metric] = results[index];
+            });
+        }
 
         // Update UI components
         if (typeof updateQuickStats === 'function') updateQuickStats();
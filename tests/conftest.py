@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app modules live at the repository root rather than in a package, and the
+# tests share helpers such as fake_firestore from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
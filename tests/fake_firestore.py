@@ -0,0 +1,196 @@
+"""
+In-memory stand-in for the parts of the Firestore client the app uses, so
+analytics can be checked against a fixed dataset without a live project
+"""
+import operator
+from collections import namedtuple
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge, 'in': lambda value, options: value in options,
+}
+
+AggregationResult = namedtuple('AggregationResult', ['alias', 'value'])
+
+
+class FakeFirestore:
+    def __init__(self, documents=None):
+        # Full document path -> field dict
+        self.documents = {path: dict(data) for path, data in (documents or {}).items()}
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    def collection_group(self, name):
+        return FakeQuery(self, name, group=True)
+
+    def batch(self):
+        return FakeBatch()
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._db, self.path.rsplit('/', 1)[0])
+
+    def get(self):
+        return FakeSnapshot(self, self._db.documents.get(self.path))
+
+    def set(self, data):
+        self._db.documents[self.path] = dict(data)
+
+    def update(self, data):
+        self._db.documents[self.path].update(data)
+
+    def delete(self):
+        self._db.documents.pop(self.path, None)
+
+
+class FakeCollectionReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    @property
+    def parent(self):
+        if '/' not in self.path:
+            return None
+        return FakeDocumentReference(self._db, self.path.rsplit('/', 1)[0])
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and fields is not None:
+            data = {field: value for field, value in data.items() if field in fields}
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeQuery:
+    def __init__(self, db, name, group=False, filters=(), fields=None, order=None, limit=None, after=None):
+        self._db = db
+        self._name = name
+        self._group = group
+        self._filters = filters
+        self._fields = fields
+        self._order = order
+        self._limit = limit
+        self._after = after
+
+    def _copy(self, **changes):
+        state = dict(
+            group=self._group, filters=self._filters, fields=self._fields,
+            order=self._order, limit=self._limit, after=self._after,
+        )
+        state.update(changes)
+        return FakeQuery(self._db, self._name, **state)
+
+    def document(self, document_id):
+        return FakeDocumentReference(self._db, f"{self._name}/{document_id}")
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(order=(field, direction))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot.reference.path)
+
+    def _in_scope(self, path):
+        parts = path.split('/')
+        if self._group:
+            return parts[-2] == self._name
+        return '/'.join(parts[:-1]) == self._name
+
+    def _matching(self):
+        matches = []
+        for path, data in sorted(self._db.documents.items()):
+            if not self._in_scope(path):
+                continue
+            # Like Firestore, filters and ordering skip documents without the field
+            if all(field in data and OPERATORS[op](data[field], value) for field, op, value in self._filters):
+                matches.append((path, data))
+
+        if self._order and self._order[0] != '__name__':
+            field, direction = self._order
+            matches = [match for match in matches if field in match[1]]
+            matches.sort(key=lambda match: (match[1][field] is not None, match[1][field]), reverse=direction == 'DESCENDING')
+        if self._after is not None:
+            matches = [match for match in matches if match[0] > self._after]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        return matches
+
+    def stream(self):
+        for path, data in self._matching():
+            yield FakeSnapshot(FakeDocumentReference(self._db, path), data, self._fields)
+
+    def get(self):
+        return list(self.stream())
+
+    def count(self, alias='field_1'):
+        return FakeAggregationQuery(self).count(alias)
+
+    def sum(self, field, alias='field_1'):
+        return FakeAggregationQuery(self).sum(field, alias)
+
+    def avg(self, field, alias='field_1'):
+        return FakeAggregationQuery(self).avg(field, alias)
+
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self._query = query
+        self._aggregations = []
+
+    def count(self, alias='field_1'):
+        self._aggregations.append((alias, lambda docs: len(docs)))
+        return self
+
+    def sum(self, field, alias='field_1'):
+        self._aggregations.append((alias, lambda docs: sum(data.get(field) or 0 for _, data in docs)))
+        return self
+
+    def avg(self, field, alias='field_1'):
+        def average(docs):
+            values = [data[field] for _, data in docs if isinstance(data.get(field), (int, float))]
+            return sum(values) / len(values) if values else None
+        self._aggregations.append((alias, average))
+        return self
+
+    def get(self):
+        docs = self._query._matching()
+        return [[AggregationResult(alias, aggregate(docs)) for alias, aggregate in self._aggregations]]
+
+
+class FakeBatch:
+    def __init__(self):
+        self._updates = []
+
+    def update(self, reference, data):
+        self._updates.append((reference, data))
+
+    def commit(self):
+        for reference, data in self._updates:
+            reference.update(data)
+        self._updates = []
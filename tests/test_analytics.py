@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app as app_module
+from app import MedicalAnalytics
+from backfill_conversations import backfill
+from fake_firestore import FakeFirestore
+
+NOW = datetime.now(timezone.utc)
+YESTERDAY_9AM = (NOW - timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+TWO_DAYS_AGO_2PM = (NOW - timedelta(days=2)).replace(hour=14, minute=0, second=0, microsecond=0)
+FORTY_DAYS_AGO_2PM = (NOW - timedelta(days=40)).replace(hour=14, minute=0, second=0, microsecond=0)
+
+# Three users with one chat each. m2 predates the denormalized user_id and is
+# attributed through its chat, m4 falls outside the 30 day window and m5 has no timestamp
+DOCUMENTS = {
+    'users/u1': {'user_id': 'u1', 'display_name': 'Asha', 'age': 30},
+    'users/u2': {'user_id': 'u2', 'display_name': 'Ravi', 'age': 70},
+    'users/u3': {'user_id': 'u3', 'display_name': 'Mei', 'age': None},
+    'users/u1/chats/c1': {'user_id': 'u1', 'message_count': 3},
+    'users/u2/chats/c2': {'user_id': 'u2', 'message_count': 1},
+    'users/u3/chats/c3': {'user_id': 'u3', 'message_count': 2},
+    'users/u1/chats/c1/conversations/m1': {
+        'user_id': 'u1', 'user_message': 'I have a fever and headache',
+        'bot_response': 'Take paracetamol', 'timestamp': YESTERDAY_9AM,
+    },
+    'users/u1/chats/c1/conversations/m2': {
+        'user_message': 'Can I take Advil with food?',
+        'bot_response': 'Ibuprofen is fine with food.', 'timestamp': YESTERDAY_9AM + timedelta(minutes=30),
+    },
+    'users/u2/chats/c2/conversations/m3': {
+        'user_id': 'u2', 'user_message': 'Feeling anxious and stressed',
+        'bot_response': '', 'timestamp': TWO_DAYS_AGO_2PM,
+    },
+    'users/u3/chats/c3/conversations/m4': {
+        'user_id': 'u3', 'user_message': '',
+        'bot_response': 'Please rest. ' * 20, 'timestamp': FORTY_DAYS_AGO_2PM,
+    },
+    'users/u3/chats/c3/conversations/m5': {
+        'user_id': 'u3', 'user_message': 'hi', 'bot_response': 'Hi',
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    app_module.get_redis.cache_clear()
+
+
+@pytest.fixture
+def analytics():
+    return MedicalAnalytics(FakeFirestore(DOCUMENTS))
+
+
+def test_medicine_searches(analytics):
+    result = analytics.get_medicine_search_stats()
+
+    # Brand names count under their medicine, so advil and ibuprofen are one entry
+    assert result['total_medicines_searched'] == 2
+    assert {stat['medicine']: stat['users'] for stat in result['medicine_statistics']} == {
+        'paracetamol': [{'user_id': 'u1', 'user_name': 'Asha', 'search_context': 'take paracetamol'}],
+        'ibuprofen': [{'user_id': 'u1', 'user_name': 'Asha', 'search_context': 'can i take advil with food?'}],
+    }
+
+
+def test_daily_engagement(analytics):
+    result = analytics.get_daily_user_engagement()
+    queries_by_date = {day['date']: day['queries'] for day in result['daily_engagement']}
+
+    assert len(result['daily_engagement']) == 30
+    assert queries_by_date[YESTERDAY_9AM.strftime('%Y-%m-%d')] == 2
+    assert queries_by_date[TWO_DAYS_AGO_2PM.strftime('%Y-%m-%d')] == 1
+    assert result['total_queries_30_days'] == 3
+    assert result['average_daily_queries'] == 0.1
+
+
+def test_peak_usage_hours(analytics):
+    result = analytics.get_peak_usage_hours()
+    usage_by_hour = {row['hour']: row['usage_count'] for row in result['hourly_usage'] if row['usage_count']}
+
+    assert usage_by_hour == {'09:00': 2, '14:00': 2}
+    assert result['peak_hour'] == '09:00'
+    assert result['peak_hour_count'] == 2
+    assert result['total_conversations_analyzed'] == 5
+
+
+def test_response_times(analytics):
+    assert analytics.get_response_time_analysis() == {
+        'total_responses': 5,
+        'average_response_time': 1.11,
+        'max_response_time': 3.1,
+        'min_response_time': 0.5,
+        'fast_responses': 4,
+        'slow_responses': 1,
+    }
+
+
+def test_content_categories(analytics):
+    result = analytics.get_content_category_analysis()
+
+    assert result['total_queries'] == 4
+    assert {row['category']: row['count'] for row in result['category_breakdown']} == {
+        'Symptoms': 1, 'Nutrition': 1, 'Mental Health': 1, 'Other': 1,
+    }
+    assert result['categorized_examples'][0] == {
+        'message': 'i have a fever and headache',
+        'category': 'symptoms',
+        'keywords': ['fever', 'headache', 'ache'],
+    }
+
+
+def test_scan_runs_once_for_every_scan_metric(analytics, monkeypatch):
+    build = analytics._build_conversation_scan
+    calls = []
+    monkeypatch.setattr(analytics, '_build_conversation_scan', lambda: calls.append(1) or build())
+
+    analytics.get_metrics(['medicineSearch', 'dailyEngagement', 'peakHours', 'responseTimes', 'contentCategories'])
+
+    assert len(calls) == 1
+
+
+def test_age_scan(analytics):
+    analytics.USE_DENORMALIZED_BUCKETS = 'false'
+    result = analytics.get_age_category_query_analysis()
+    counts = {row['age_group']: row['query_count'] for row in result['age_breakdown'] if row['query_count']}
+
+    assert counts == {'25-34': 2, '65+': 1}
+    assert result['unique_users_analyzed'] == 3
+
+
+def test_age_buckets_match_the_scan():
+    scan = MedicalAnalytics(FakeFirestore(DOCUMENTS))
+    scan.USE_DENORMALIZED_BUCKETS = 'false'
+    expected = scan.get_age_category_query_analysis()
+
+    db = FakeFirestore(DOCUMENTS)
+    # Before the backfill, auto mode falls back to the scan
+    assert MedicalAnalytics(db)._age_bucket_aggregates(require_coverage=True) is None
+
+    backfill(db)
+    bucketed = MedicalAnalytics(db)
+    result = bucketed.get_age_category_query_analysis()
+
+    assert result['age_breakdown'] == expected['age_breakdown']
+    assert result['most_active_age_group'] == expected['most_active_age_group']
+    # Distinct users are only known when conversations are scanned
+    assert result['unique_users_analyzed'] is None
+
+
+def test_age_buckets_need_full_coverage():
+    db = FakeFirestore(DOCUMENTS)
+    backfill(db)
+    del db.documents['users/u1/chats/c1/conversations/m2']['user_age_bucket']
+
+    assert MedicalAnalytics(db)._age_bucket_aggregates(require_coverage=True) is None
+
+
+@pytest.fixture
+def client(monkeypatch, analytics):
+    monkeypatch.setattr(app_module, 'get_analytics', lambda: analytics)
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    {'metrics': 'ageCategoryQueries'},
+    {'metrics': [['peakHours']]},
+    {'metrics': [{}]},
+    ['peakHours'],
+])
+def test_batch_rejects_malformed_metrics(client, body):
+    response = client.post('/api/batch', json=body)
+
+    assert response.status_code == 400
+    assert not response.get_json()['success']
+
+
+def test_batch_rejects_unknown_metrics(client):
+    response = client.post('/api/batch', json={'metrics': ['peakHours', 'nope']})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unknown metrics: nope'
+
+
+def test_batch_returns_requested_metrics(client):
+    response = client.post('/api/batch', json={'metrics': ['peakHours', 'responseTimes']})
+
+    assert response.status_code == 200
+    assert set(response.get_json()['data']) == {'peakHours', 'responseTimes'}
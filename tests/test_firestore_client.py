@@ -0,0 +1,61 @@
+from firestore_client import CachedFirestoreProxy
+
+
+class FakeQuery:
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    def where(self, *args, **kwargs):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def stream(self):
+        self.reads += 1
+        return (doc for doc in self.docs)
+
+    def get(self):
+        self.reads += 1
+        return list(self.docs)
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.query = FakeQuery(docs)
+
+    def collection(self, name):
+        return self.query
+
+
+def test_limited_results_are_reused():
+    db = FakeDB(range(7))
+    proxy = CachedFirestoreProxy(db)
+
+    assert proxy.collection('users').limit(10).get() == list(range(7))
+    assert list(proxy.collection('users').limit(10).stream()) == list(range(7))
+    assert proxy.collection('users').limit(10).get() == list(range(7))
+    assert db.query.reads == 2
+
+
+def test_unbounded_streams_are_not_cached():
+    db = FakeDB(range(7))
+    proxy = CachedFirestoreProxy(db)
+
+    stream = proxy.collection('users').where('age', '>', 18).stream()
+    assert not isinstance(stream, (list, tuple))
+    assert list(stream) == list(range(7))
+    assert list(proxy.collection('users').where('age', '>', 18).stream()) == list(range(7))
+    assert db.query.reads == 2
+
+
+def test_mutating_a_cached_result_does_not_leak_into_later_queries():
+    proxy = CachedFirestoreProxy(FakeDB(range(7)))
+
+    proxy.collection('users').where('age', '>', 18).limit(10).get().clear()
+    streamed = list(proxy.collection('users').limit(10).stream())
+    streamed.clear()
+
+    assert len(proxy.collection('users').where('age', '>', 18).limit(10).get()) == 7
+    assert len(list(proxy.collection('users').limit(10).stream())) == 7
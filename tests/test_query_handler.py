@@ -0,0 +1,89 @@
+import pytest
+
+from query_handler import DatabaseQueryHandler, SAFE_BUILTINS, safe_getattr
+
+
+def run(code):
+    return DatabaseQueryHandler(db=object()).execute_generated_code(code, debug=False)
+
+
+def test_string_attribute_escape_is_blocked():
+    code = '''
+def execute_query():
+    subclasses = getattr(getattr(getattr((), '__cl'+'ass__'), '__ba'+'se__'), '__subcl'+'asses__')()
+    return {'data': [{'n': len(subclasses)}], 'summary': 'escaped'}
+'''
+    result = run(code)
+
+    assert not result['success']
+    assert '__class__' in result['error']
+
+
+def test_type_is_not_exposed():
+    assert 'type' not in SAFE_BUILTINS
+
+
+def test_getattr_still_reads_public_attributes():
+    class Doc:
+        id = 'doc1'
+
+    assert safe_getattr(Doc(), 'id') == 'doc1'
+    assert safe_getattr(Doc(), 'missing', None) is None
+    with pytest.raises(ValueError):
+        safe_getattr(Doc(), '_private', None)
+
+
+def test_literal_dunder_attribute_is_rejected():
+    code = '''
+def execute_query():
+    return {'data': [], 'summary': ().__class__.__name__}
+'''
+    result = run(code)
+
+    assert not result['success']
+    assert 'may not access' in result['error']
+
+
+def test_generator_frame_escape_is_blocked():
+    code = '''
+def execute_query():
+    h = []
+    g = (h[0].gi_frame.f_back.f_back.f_globals for _ in [1])
+    h.append(g)
+    return {'data': [], 'summary': str(next(g)['os'].getcwd())}
+'''
+    result = run(code)
+
+    assert not result['success']
+    assert 'may not access' in result['error']
+
+
+def test_getattr_rejects_frame_attributes():
+    generator = (n for n in [1])
+
+    with pytest.raises(ValueError):
+        safe_getattr(generator, 'gi_frame')
+
+
+def test_modules_are_not_exposed():
+    code = '''
+def execute_query():
+    return {'data': [], 'summary': str(pd.io.common.os.getuid())}
+'''
+    result = run(code)
+
+    assert not result['success']
+    assert 'pd' in result['error']
+
+
+def test_narrowed_modules_still_work():
+    code = '''
+def execute_query():
+    words = re.findall(r'[a-z]+', 'para cetamol')
+    logger.info('found %d words', len(words))
+    return {'data': json.loads(json.dumps([{'words': words}])), 'summary': 'ok'}
+'''
+    result = run(code)
+
+    assert result['success']
+    assert result['results']['data'] == [{'words': ['para', 'cetamol']}]